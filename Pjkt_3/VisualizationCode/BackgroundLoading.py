@@ -0,0 +1,89 @@
+import queue
+import threading
+
+import DataParser
+import LazyLoading
+import Profiling
+import SnapshotCache
+
+
+# the messages a BackgroundLoader sends, as (kind, ...) tuples
+DOMAINS = 'domains'   # (DOMAINS, domains) every domain is known, none may be loaded yet
+DOMAIN = 'domain'     # (DOMAIN, domain, number loaded, number of domains) one more domain is ready
+DONE = 'done'         # (DONE, domains) everything is loaded
+ERROR = 'error'       # (ERROR, exception) loading stopped
+
+
+class BackgroundLoader():
+    """Loads the TableData on a worker thread so the window can open straight
+    away. The thread never touches Tk, it only puts messages on a queue that
+    the Tk side empties with poll() from an after() callback.
+
+    A current ColumnarStore is mapped in a domain at a time, and an unchanged
+    dataset comes out of the snapshot in one go. Otherwise Library Info is
+    read first, then the rest of the csvs once with LazyLoading's loadAll,
+    and the snapshot is written before any domain is handed to the window"""
+
+    def __init__(self, keepIssues=False, keepIssueTable=True, dataDirectory=DataParser.TABLE_DATA_DIRECTORY,
+                 useCache=True):
+        self.keepIssues = keepIssues
+        self.keepIssueTable = keepIssueTable
+        self.dataDirectory = dataDirectory
+        self.useCache = useCache
+
+        self.messages = queue.Queue()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=Profiling.profileThread(self.run), name='BackgroundLoader',
+                                       daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            self.load()
+        except Exception as error:
+            self.messages.put((ERROR, error))
+
+    def load(self):
+        domains = None
+        if self.useCache:
+            domains = SnapshotCache.readStore(self.keepIssues, self.keepIssueTable, self.dataDirectory)
+        # the store and the snapshot both stand in for the csvs, so neither
+        # needs a new snapshot written
+        cached = domains is not None
+
+        signatures = None
+        if not cached:
+            # taken before anything is read, see SnapshotCache.saveSnapshot
+            signatures = SnapshotCache.fileSignatures(self.dataDirectory)
+            if self.useCache:
+                domains = SnapshotCache.readSnapshot(self.keepIssues, self.keepIssueTable, self.dataDirectory)
+            cached = domains is not None
+        if not cached:
+            domains = LazyLoading.loadLibraryInfo(keepIssues=self.keepIssues, keepIssueTable=self.keepIssueTable,
+                                                  dataDirectory=self.dataDirectory)
+        self.messages.put((DOMAINS, domains))
+
+        if cached:
+            loaded = (domains.ensureLoaded(domain) for domain in domains)
+        else:
+            # one pass over the csvs for all the domains. The snapshot is
+            # pickled before the window gets any of them, once it has them
+            # it fills in their caches on the Tk thread while we'd be reading
+            loaded = list(domains.loader.loadAll(domains))
+            if self.useCache:
+                SnapshotCache.saveSnapshot(domains, self.keepIssues, self.keepIssueTable, self.dataDirectory,
+                                           signatures)
+        for number, domain in enumerate(loaded, 1):
+            self.messages.put((DOMAIN, domain, number, len(domains)))
+        self.messages.put((DONE, domains))
+
+    def poll(self):
+        # every message waiting right now, without blocking
+        pending = []
+        while True:
+            try:
+                pending.append(self.messages.get_nowait())
+            except queue.Empty:
+                return pending
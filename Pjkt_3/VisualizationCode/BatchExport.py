@@ -0,0 +1,183 @@
+# Draws the graphs for every domain (or just some of them) straight to image
+# files, without Tk, so reports can be made on machines with no display:
+#
+#   python BatchExport.py --output Reports --format png svg
+#   python BatchExport.py --domain "object-relational mapping" --graph PopularityGraph --format pdf
+#   python BatchExport.py --months 12 --issue-type security performance
+
+import argparse
+import concurrent.futures
+import datetime
+import os
+import re
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import DataParser
+import Graphs
+import Profiling
+import Query
+import SnapshotCache
+
+
+FORMATS = ('png', 'svg', 'pdf')
+
+DEFAULT_OUTPUT_DIRECTORY = 'Reports'
+
+
+def fileName(name):
+    # domain names can hold spaces and slashes, keep them out of the paths
+    return re.sub(r'[^A-Za-z0-9._-]+', '_', name).strip('_') or '_'
+
+
+def newGraph(graphName, statistic='mean', plotCache=None):
+    # the named graph on an Agg canvas, with the issue time graphs showing statistic
+    graph = Graphs.GRAPHS_BY_NAME[graphName](plotCache)
+    if isinstance(graph, Graphs.DurationGraph):
+        graph.statistic = statistic
+    FigureCanvasAgg(graph.figure)
+    return graph
+
+
+def exportDomain(domain, graphNames, formats, outputDirectory, dpi=100, query=None, statistic='mean'):
+    """Runs in a worker process. Draws the named graphs for one domain, over
+    the part of its data the query covers, and saves each one in every
+    format, returning the paths written. The issue time graphs show the
+    statistic, one of Graphs.STATISTICS"""
+    directory = os.path.join(outputDirectory, fileName(domain.name))
+    os.makedirs(directory, exist_ok=True)
+
+    paths = []
+    for graphName in graphNames:
+        graph = newGraph(graphName, statistic)
+        graph.drawGraph(domain, query)
+        for fileFormat in formats:
+            path = os.path.join(directory, graphName + '.' + fileFormat)
+            with Profiling.phase('savefig ' + fileFormat):
+                graph.figure.savefig(path, format=fileFormat, dpi=dpi)
+            paths.append(path)
+    return paths
+
+
+def selectDomains(domains, domainNames=None):
+    if not domainNames:
+        return list(domains)
+
+    selected = []
+    for domainName in domainNames:
+        domain = domains.getDomain(domainName)
+        if domain is None:
+            print('no domain called ' + domainName)
+        else:
+            selected.append(domain)
+    return selected
+
+
+def exportGraphs(domains, domainNames=None, graphNames=None, formats=('png',),
+                 outputDirectory=DEFAULT_OUTPUT_DIRECTORY, workers=None, dpi=100, query=None, statistic='mean'):
+    """Draws the graphs for the chosen domains to files, spreading the domains
+    over a pool of worker processes. Returns every path written"""
+    graphNames = graphNames or [graphClass.__name__ for graphClass in Graphs.GRAPHS]
+    for graphName in graphNames:
+        if graphName not in Graphs.GRAPHS_BY_NAME:
+            raise ValueError('no graph called ' + graphName)
+    for fileFormat in formats:
+        if fileFormat not in FORMATS:
+            raise ValueError('can not export to ' + fileFormat)
+    if statistic not in Graphs.STATISTICS:
+        raise ValueError('no statistic called ' + statistic)
+
+    selected = selectDomains(domains, domainNames)
+    for domain in selected:
+        # a lazily loaded domain is read here once, not in every worker
+        domains.ensureLoaded(domain)
+
+    paths = []
+    if workers == 0:
+        # everything in this process, which is what Profiling can see
+        for domain in selected:
+            written = exportDomain(domain, graphNames, formats, outputDirectory, dpi, query, statistic)
+            print(domain.name + ': ' + str(len(written)) + ' files')
+            paths.extend(written)
+        return paths
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        exports = [pool.submit(exportDomain, domain, graphNames, formats, outputDirectory, dpi, query, statistic)
+                   for domain in selected]
+        for domain, export in zip(selected, exports):
+            written = export.result()
+            print(domain.name + ': ' + str(len(written)) + ' files')
+            paths.extend(written)
+    return paths
+
+
+def isoDate(text):
+    try:
+        return datetime.date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError('not a YYYY-MM-DD date: ' + text)
+
+
+def queryFromOptions(options):
+    # None when the whole of every domain is drawn
+    if options.months is not None:
+        query = Query.Query.lastMonths(options.months, end=options.until, issueTypes=options.issueTypes,
+                                       libraries=options.libraries)
+    else:
+        query = Query.Query(options.since, options.until, options.issueTypes, options.libraries)
+    if query == Query.Query():
+        return None
+    return query
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Draw the library comparison graphs to files')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_DIRECTORY,
+                        help='directory to write to, one sub directory per domain')
+    parser.add_argument('--format', nargs='+', default=['png'], choices=FORMATS, dest='formats')
+    parser.add_argument('--domain', nargs='+', dest='domains', metavar='NAME',
+                        help='only these domains, all of them by default')
+    parser.add_argument('--graph', nargs='+', dest='graphs', choices=sorted(Graphs.GRAPHS_BY_NAME),
+                        metavar='GRAPH', help='only these graphs: ' + ', '.join(Graphs.GRAPHS_BY_NAME))
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of processes, one per core by default, 0 to draw in this process')
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--data', default=DataParser.TABLE_DATA_DIRECTORY, help='the TableData directory')
+    parser.add_argument('--since', type=isoDate, metavar='YYYY-MM-DD',
+                        help='only issues created and releases made on or after this day')
+    parser.add_argument('--until', type=isoDate, metavar='YYYY-MM-DD',
+                        help='only issues created and releases made before this day')
+    parser.add_argument('--months', type=int, help='only the months before --until, or before tomorrow')
+    parser.add_argument('--issue-type', nargs='+', dest='issueTypes', choices=Query.ISSUE_TYPES,
+                        help='only these kinds of issues')
+    parser.add_argument('--library', nargs='+', dest='libraries', metavar='NAME',
+                        help='only these libraries of each domain')
+    parser.add_argument('--statistic', default='mean', choices=list(Graphs.STATISTICS),
+                        help='what the issue time graphs show, the mean by default')
+    parser.add_argument('--profile', nargs='?', const='', metavar='TRACE',
+                        help='print the time spent in each phase, and write a cProfile trace to TRACE if given')
+    parser.add_argument('--profile-memory', action='store_true', dest='profileMemory',
+                        help='with --profile, also the memory each phase allocates, which slows it down')
+    options = parser.parse_args(arguments)
+    if options.months is not None and options.since is not None:
+        parser.error('--months and --since can not be used together')
+    try:
+        query = queryFromOptions(options)
+    except ValueError as error:
+        parser.error(str(error))
+
+    if options.profile is not None:
+        Profiling.enable(options.profile or None, options.profileMemory)
+
+    # the same options as the app, so the two share a snapshot. Each lazily
+    # loaded domain reads the tables again, which only pays off for a few
+    domains = SnapshotCache.loadTables(keepIssues=False, dataDirectory=options.data, lazy=bool(options.domains))
+    paths = exportGraphs(domains, options.domains, options.graphs, options.formats, options.output,
+                         options.workers, options.dpi, query, options.statistic)
+    print('wrote ' + str(len(paths)) + ' files to ' + options.output)
+
+
+if __name__ == '__main__':
+    main()
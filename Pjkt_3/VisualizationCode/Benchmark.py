@@ -0,0 +1,323 @@
+# Times the parser and the graphs against made up TableData (see
+# SyntheticData) or a real TableData directory, and writes the numbers out as
+# JSON so runs can be compared:
+#
+#   python Benchmark.py --issues 1000000 --output before.json
+#   python Benchmark.py --issues 1000000 --output after.json --baseline before.json
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import numpy
+
+import ColumnarStore
+import DataParser
+import Graphs
+import Ranking
+import SnapshotCache
+import SyntheticData
+
+
+# how much slower than the baseline a benchmark can get before it's reported
+DEFAULT_TOLERANCE = 0.25
+
+
+def timeRuns(function, repeat):
+    # (seconds for each run, what the last run returned)
+    seconds = []
+    result = None
+    for run in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - start)
+    return (seconds, result)
+
+
+def summary(seconds):
+    return {'runs': seconds, 'min': min(seconds), 'median': statistics.median(seconds)}
+
+
+def peakMemory(function):
+    # the most memory Python had allocated at once while running function
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def forgetMetrics(domains):
+    # makes the next computePlotData work its numbers out from scratch
+    for domain in domains:
+        for library in domain.libraries:
+            library.metrics = None
+
+
+def benchmarkParse(dataDirectory, repeat):
+    results = {}
+    for (name, keepIssues, keepIssueTable) in (('parseTables', True, True),
+                                               ('parseTablesTotalsOnly', False, False)):
+        def parse():
+            return DataParser.parseTables(keepIssues=keepIssues, keepIssueTable=keepIssueTable,
+                                          dataDirectory=dataDirectory)
+        (seconds, domains) = timeRuns(parse, repeat)
+        results[name] = summary(seconds)
+        results[name]['peakMemoryBytes'] = peakMemory(parse)
+
+    # the same tables out of a ColumnarStore, every domain loaded
+    storeDirectory = ColumnarStore.storePath(dataDirectory)
+    SnapshotCache.saveStore(storeDirectory, dataDirectory)
+
+    def load():
+        domains = DataParser.openColumnar(keepIssues=False, dataDirectory=dataDirectory)
+        for domain in domains:
+            domains.ensureLoaded(domain)
+        return domains
+    (seconds, domains) = timeRuns(load, repeat)
+    results['openColumnar'] = summary(seconds)
+    results['openColumnar']['peakMemoryBytes'] = peakMemory(load)
+    shutil.rmtree(storeDirectory)
+    return results
+
+
+def benchmarkGraphs(domains, repeat):
+    """For every graph, the time to compute its data for all the domains with
+    nothing memoized, and the time to draw it for all of them with Agg"""
+    results = {}
+    for graphClass in Graphs.GRAPHS:
+        graph = graphClass()
+        canvas = FigureCanvasAgg(graph.figure)
+
+        def compute():
+            forgetMetrics(domains)
+            return [graph.computePlotData(domain) for domain in domains]
+
+        (computeSeconds, allData) = timeRuns(compute, repeat)
+
+        def draw():
+            for data in allData:
+                graph.axis.clear()
+                graph.plotData(data)
+                canvas.draw()
+
+        (drawSeconds, result) = timeRuns(draw, repeat)
+        results[graphClass.__name__] = {'computePlotData': summary(computeSeconds), 'draw': summary(drawSeconds)}
+    return results
+
+
+def benchmarkRanking(domains, repeat):
+    """The time to build the RankingIndex with nothing memoized, and the time
+    for top 10 queries with the default weights and with custom ones"""
+    def build():
+        forgetMetrics(domains)
+        domains.ranking = None
+        return Ranking.rankingIndex(domains)
+
+    (buildSeconds, index) = timeRuns(build, repeat)
+    weights = {'popularity': 3, 'responseTime': 2, 'stackOverflow': 1}
+    # the queries are quick enough that one run of each is mostly timer noise
+    (defaultSeconds, ranked) = timeRuns(lambda: [index.topK(10) for run in range(100)], repeat)
+    (customSeconds, ranked) = timeRuns(lambda: [index.topK(10, weights) for run in range(100)], repeat)
+    return {'rankingIndex': summary(buildSeconds),
+            'topK100Default': summary(defaultSeconds),
+            'topK100Custom': summary(customSeconds)}
+
+
+def startupProbe(dataDirectory, useCache):
+    """Runs in its own process. Starts the app the way Visualizations does and
+    prints the seconds, since the process started, until the window is up and
+    until the first domain button is there. Without a display only the
+    loader is timed and the window time is null"""
+    import BackgroundLoading
+
+    loader = BackgroundLoading.BackgroundLoader(keepIssues=False, dataDirectory=dataDirectory, useCache=useCache)
+    timings = {'window': None, 'firstDomain': None}
+    try:
+        import tkinter
+        import Visualizations
+        app = Visualizations.App(loader)
+        app.update()
+        timings['window'] = processSeconds()
+        while timings['firstDomain'] is None:
+            app.update()
+            if app.frames[Visualizations.StartPage].buttons:
+                timings['firstDomain'] = processSeconds()
+        app.destroy()
+    except Exception as error:
+        # no tkinter, or no display for it to open a window on
+        if type(error).__name__ not in ('ImportError', 'ModuleNotFoundError', 'TclError'):
+            raise
+        if loader.thread is None:
+            loader.start()
+        while timings['firstDomain'] is None:
+            for message in loader.poll():
+                if message[0] == BackgroundLoading.DOMAIN:
+                    timings['firstDomain'] = processSeconds()
+                elif message[0] == BackgroundLoading.ERROR:
+                    raise message[1]
+            time.sleep(0.001)
+    print(json.dumps(timings))
+
+
+def processSeconds():
+    # seconds since this process was started
+    return time.time() - PROCESS_START
+
+
+def benchmarkStartup(dataDirectory, repeat):
+    results = {}
+    for (name, useCache) in (('startup', False), ('startupFromSnapshot', True)):
+        runs = []
+        for run in range(repeat):
+            command = [sys.executable, os.path.abspath(__file__), '--startup-probe', dataDirectory]
+            if useCache:
+                command.append('--use-cache')
+            # the process start time is passed in so interpreter start up is counted too
+            environment = dict(os.environ, BENCHMARK_PROCESS_START=repr(time.time()))
+            output = subprocess.run(command, stdout=subprocess.PIPE, check=True, env=environment,
+                                    cwd=os.path.dirname(os.path.abspath(__file__)), universal_newlines=True)
+            runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+        results[name] = {'firstDomain': summary([timings['firstDomain'] for timings in runs])}
+        if all(timings['window'] is not None for timings in runs):
+            results[name]['window'] = summary([timings['window'] for timings in runs])
+        else:
+            results[name]['window'] = None
+
+        if not useCache:
+            # the snapshot the second set of runs starts from
+            SnapshotCache.loadTables(keepIssues=False, dataDirectory=dataDirectory)
+    return results
+
+
+def datasetDescription(dataDirectory):
+    domains = DataParser.parseTables(keepIssues=False, keepIssueTable=False, dataDirectory=dataDirectory)
+    libraries = [library for domain in domains for library in domain.libraries]
+    return {'domains': len(domains),
+            'libraries': len(libraries),
+            'releases': sum(len(library.releaseDates) for library in libraries),
+            'issues': sum(library.issueStats.count for library in libraries),
+            'bytes': {tableFile: os.path.getsize(DataParser.tablePath(tableFile, dataDirectory))
+                      for tableFile in DataParser.TABLE_FILES}}
+
+
+def environmentDescription():
+    return {'python': platform.python_version(),
+            'numpy': numpy.__version__,
+            'matplotlib': matplotlib.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count()}
+
+
+def flatten(results, prefix=''):
+    # {'a': {'b': {'median': 1}}} -> {'a.b': 1}, only keeping the medians
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            if 'median' in value:
+                flat[prefix + key] = value['median']
+            else:
+                flat.update(flatten(value, prefix + key + '.'))
+    return flat
+
+
+def regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """(benchmark, baseline seconds, seconds) for everything that got more than
+    tolerance slower than in the baseline results"""
+    before = flatten(baseline['benchmarks'])
+    after = flatten(results['benchmarks'])
+    return [(name, before[name], after[name]) for name in sorted(after)
+            if name in before and after[name] > before[name] * (1 + tolerance)]
+
+
+def runBenchmarks(dataDirectory, repeat=3, startup=True):
+    domains = DataParser.parseTables(keepIssues=False, dataDirectory=dataDirectory)
+    benchmarks = {'parse': benchmarkParse(dataDirectory, repeat),
+                  'graphs': benchmarkGraphs(list(domains), repeat),
+                  'ranking': benchmarkRanking(domains, repeat)}
+    if startup:
+        benchmarks['startup'] = benchmarkStartup(dataDirectory, repeat)
+
+    return {'dataset': datasetDescription(dataDirectory),
+            'environment': environmentDescription(),
+            'repeat': repeat,
+            'benchmarks': benchmarks}
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Time the parser and the graphs')
+    parser.add_argument('--data', help='an existing TableData directory to use instead of made up data')
+    parser.add_argument('--libraries', type=int, default=33)
+    parser.add_argument('--domains', type=int, default=10)
+    parser.add_argument('--releases', type=int, default=300)
+    parser.add_argument('--issues', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--no-startup', action='store_true', help='skip timing the app starting up')
+    parser.add_argument('--output', help='file to write the results to, printed when left out')
+    parser.add_argument('--baseline', help='results from an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument('--startup-probe', help=argparse.SUPPRESS)
+    parser.add_argument('--use-cache', action='store_true', help=argparse.SUPPRESS)
+    options = parser.parse_args(arguments)
+
+    if options.startup_probe:
+        startupProbe(options.startup_probe, options.use_cache)
+        return 0
+
+    temporaryDirectory = None
+    dataDirectory = options.data
+    if dataDirectory is None:
+        temporaryDirectory = tempfile.mkdtemp(prefix='TableData-')
+        dataDirectory = temporaryDirectory
+        SyntheticData.generateTables(dataDirectory, options.libraries, options.domains, options.releases,
+                                     options.issues, options.seed)
+    else:
+        # the parse benchmark writes and removes a ColumnarStore and the
+        # startup runs write a snapshot, neither of which may touch real ones
+        temporaryDirectory = tempfile.mkdtemp(prefix='TableData-')
+        for tableFile in DataParser.TABLE_FILES:
+            shutil.copy(DataParser.tablePath(tableFile, dataDirectory), temporaryDirectory)
+        dataDirectory = temporaryDirectory
+
+    try:
+        results = runBenchmarks(dataDirectory, options.repeat, not options.no_startup)
+        results['dataset']['source'] = options.data or 'SyntheticData seed ' + str(options.seed)
+    finally:
+        if temporaryDirectory is not None:
+            shutil.rmtree(temporaryDirectory)
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, 'w') as outputFile:
+            outputFile.write(text + '\n')
+    else:
+        print(text)
+
+    if options.baseline:
+        with open(options.baseline) as baselineFile:
+            slower = regressions(results, json.load(baselineFile), options.tolerance)
+        for (name, before, after) in slower:
+            print('slower: ' + name + ' ' + format(before, '.4f') + 's -> ' + format(after, '.4f') + 's')
+        if slower:
+            return 1
+    return 0
+
+
+PROCESS_START = float(os.environ.get('BENCHMARK_PROCESS_START', time.time()))
+
+if __name__ == '__main__':
+    sys.exit(main())
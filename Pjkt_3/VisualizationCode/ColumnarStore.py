@@ -0,0 +1,264 @@
+# A binary, column per file copy of the TableData csvs that loads without
+# parsing anything. Every column is a .npy file opened with numpy's mmap_mode,
+# so a column is only read from disk where it's used, and a domain's rows are
+# one contiguous slice of each column. Make or refresh it with
+#
+#   python ColumnarStore.py --data TableData
+#
+# The csvs stay what the data is kept and shared as. SnapshotCache.loadTables
+# and the BackgroundLoader read the store instead of them while it's current.
+#
+# The store directory holds:
+#   manifest.json         the domains and their libraries in order (the
+#                         dictionary the library codes index into), the small
+#                         per library values, and the csvs it was made from
+#   lastModified.npy      int64 epoch days per library, NOT_A_TIME for none
+#   lastDiscussed.npy     int64 epoch days per library, NOT_A_TIME for none
+#   releaseDays.npy       int64 epoch days, each library's sorted releases in
+#   releaseOffsets.npy    library order, library i at [offsets[i], offsets[i + 1])
+#   issueOffsets.npy      each library's rows of the issue columns, the same way
+#   issueLibrary.npy      int32 position of the issue's library in its domain
+#   issueIds.npy          fixed width unicode
+#   issueCreated.npy      int64 epoch seconds, NOT_A_TIME for none, which is
+#   issueClosed.npy       NaT when viewed as datetime64[s]
+#   issueFirstComment.npy
+#   issuePerformance.npy  one bit per issue, numpy.packbits order
+#   issueSecurity.npy
+
+import argparse
+import json
+import os
+import shutil
+
+import numpy
+
+import DataStructures
+import DateParsing
+import IssueTable
+import Profiling
+import Rollups
+
+
+# bump this whenever the files above change
+STORE_VERSION = 1
+
+STORE_DIRECTORY = 'Columnar'
+MANIFEST = 'manifest.json'
+
+
+def storePath(dataDirectory):
+    return os.path.join(dataDirectory, STORE_DIRECTORY)
+
+
+def unpackBits(packed, start, end):
+    # the bools for rows [start, end) of a numpy.packbits column, only
+    # unpacking the bytes those rows are in
+    first = start // 8
+    bits = numpy.unpackbits(packed[first:(end + 7) // 8])
+    return bits[start - first * 8:end - first * 8].view(bool)
+
+
+def writeStore(domains, directory, sources=None):
+    """Writes the domains to a store in directory, replacing any store there.
+    The domains need their Issue objects, so parse them with keepIssues set.
+    sources goes into the manifest as is, SnapshotCache puts the csv
+    signatures there"""
+    libraries = [library for domain in domains for library in domain.libraries]
+
+    manifest = {'version': STORE_VERSION,
+                'sources': sources,
+                'issueDataOffset': max([domain.issueDataOffset for domain in domains] or [0]),
+                'domains': [{'name': domain.name,
+                             'libraries': [{'name': library.name,
+                                            'gitHubRepository': library.gitHubRepository,
+                                            'popularity': library.popularity,
+                                            'breakingChangesPerRelease': library.breakingChangesPerRelease,
+                                            'questionsAsked': library.questionsAsked,
+                                            # the text the csv had in place of a date, like 'Never'
+                                            'lastDiscussedText': library.lastDiscussedOnStackOverflow
+                                            if isinstance(library.lastDiscussedOnStackOverflow, str) else None}
+                                           for library in domain.libraries]}
+                            for domain in domains]}
+
+    def days(date):
+        return DateParsing.toEpochDay(None if isinstance(date, str) else date)
+
+    def offsets(lengths):
+        return numpy.concatenate(([0], numpy.cumsum(lengths, dtype=numpy.int64)))
+
+    columns = {
+        'lastModified': numpy.array([days(library.lastModificationDate) for library in libraries], dtype=numpy.int64),
+        'lastDiscussed': numpy.array([days(library.lastDiscussedOnStackOverflow) for library in libraries],
+                                     dtype=numpy.int64),
+        'releaseDays': numpy.array([days(date) for library in libraries for date in library.releaseDates],
+                                   dtype=numpy.int64),
+        'releaseOffsets': offsets([len(library.releaseDates) for library in libraries]),
+        'issueOffsets': offsets([len(library.issues) for library in libraries]),
+        'issueLibrary': numpy.repeat(numpy.array([libraryId for domain in domains
+                                                  for libraryId in range(len(domain.libraries))], dtype=numpy.int32),
+                                     [len(library.issues) for library in libraries]),
+        'issueIds': numpy.array([str(issueId) for library in libraries for issueId in library.issues.ids],
+                                dtype=str),
+    }
+
+    def joined(field, dtype):
+        # an IssueList column of every library, one after the other
+        return numpy.concatenate([numpy.empty(0, dtype=dtype)] +
+                                 [numpy.frombuffer(getattr(library.issues, field), dtype=dtype)
+                                  for library in libraries])
+
+    columns['issueCreated'] = joined('creationDates', numpy.int64)
+    columns['issueClosed'] = joined('closingDates', numpy.int64)
+    columns['issueFirstComment'] = joined('firstCommentDates', numpy.int64)
+    flags = joined('flags', numpy.uint8)
+    columns['issuePerformance'] = numpy.packbits((flags & DataStructures.PERFORMANCE) != 0)
+    columns['issueSecurity'] = numpy.packbits((flags & DataStructures.SECURITY) != 0)
+
+    # written next to the old store and swapped in, the manifest last so a
+    # store cut short has none
+    temporaryDirectory = directory + '.tmp'
+    shutil.rmtree(temporaryDirectory, ignore_errors=True)
+    os.makedirs(temporaryDirectory)
+    for name, column in columns.items():
+        numpy.save(os.path.join(temporaryDirectory, name + '.npy'), column)
+    with open(os.path.join(temporaryDirectory, MANIFEST), 'w') as manifestFile:
+        json.dump(manifest, manifestFile)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(temporaryDirectory, directory)
+
+
+def readManifest(directory):
+    """The store's manifest, or None when there's no usable store"""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as manifestFile:
+            manifest = json.load(manifestFile)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != STORE_VERSION:
+        return None
+    return manifest
+
+
+class StoreLoader():
+    """Fills in a domain from the store the first time it's opened, the same
+    way LazyLoading.DomainLoader does from the csvs. The columns are memory
+    mapped, so the rows of domains that are never opened aren't read"""
+
+    def __init__(self, directory, manifest, keepIssues=True, keepIssueTable=True):
+        self.directory = directory
+        self.manifest = manifest
+        self.keepIssues = keepIssues
+        self.keepIssueTable = keepIssueTable
+        self.columns = {}
+
+        # each domain's manifest entry and where its libraries start in the
+        # library order
+        self.domainInfos = {}
+        start = 0
+        for domainInfo in manifest['domains']:
+            self.domainInfos[domainInfo['name']] = (domainInfo, start)
+            start += len(domainInfo['libraries'])
+
+    def column(self, name):
+        column = self.columns.get(name)
+        if column is None:
+            column = self.columns[name] = numpy.load(os.path.join(self.directory, name + '.npy'), mmap_mode='r')
+        return column
+
+    def loadDomain(self, domains, domain):
+        with Profiling.phase('loadDomain'):
+            self.readColumns(domain)
+
+    def readColumns(self, domain):
+        (domainInfo, first) = self.domainInfos[domain.name]
+        releaseOffsets = self.column('releaseOffsets')
+        lastModified = self.column('lastModified')
+        lastDiscussed = self.column('lastDiscussed')
+
+        for libraryId, (library, libraryInfo) in enumerate(zip(domain.libraries, domainInfo['libraries']), first):
+            library.popularity = libraryInfo['popularity']
+            library.breakingChangesPerRelease = [tuple(change) for change in libraryInfo['breakingChangesPerRelease']]
+            library.questionsAsked = libraryInfo['questionsAsked']
+            library.lastModificationDate = DateParsing.fromEpochDay(int(lastModified[libraryId]))
+            library.lastDiscussedOnStackOverflow = libraryInfo['lastDiscussedText']
+            if library.lastDiscussedOnStackOverflow is None:
+                library.lastDiscussedOnStackOverflow = DateParsing.fromEpochDay(int(lastDiscussed[libraryId]))
+            library.setReleaseDays(self.column('releaseDays')[releaseOffsets[libraryId]:releaseOffsets[libraryId + 1]])
+            library.changed()
+
+        with Profiling.phase('issue columns'):
+            issueOffsets = self.column('issueOffsets')
+            (start, end) = (int(issueOffsets[first]), int(issueOffsets[first + len(domain.libraries)]))
+            # slices of the mapped columns, nothing is copied
+            table = IssueTable.IssueTable(self.column('issueLibrary')[start:end],
+                                          self.column('issueCreated')[start:end].view('datetime64[s]'),
+                                          self.column('issueClosed')[start:end].view('datetime64[s]'),
+                                          self.column('issueFirstComment')[start:end].view('datetime64[s]'),
+                                          unpackBits(self.column('issuePerformance'), start, end),
+                                          unpackBits(self.column('issueSecurity'), start, end))
+            stats = table.libraryStats(len(domain.libraries))
+            sketches = table.durationSketches(len(domain.libraries))
+            for libraryId in numpy.flatnonzero(stats['count']):
+                issueStats = domain.libraries[libraryId].issueStats
+                issueStats.addTotals(
+                    {attribute: stats[key][libraryId].item() for key, attribute in IssueTable.STAT_FIELDS.items()})
+                issueStats.addSketchCounts(sketches['response'][libraryId], sketches['closing'][libraryId])
+
+            if self.keepIssueTable:
+                domain.issueTable = table
+            if self.keepIssues:
+                issueIds = self.column('issueIds')
+                flags = (table.performance * DataStructures.PERFORMANCE
+                         + table.security * DataStructures.SECURITY).astype(numpy.uint8)
+                for libraryId, library in enumerate(domain.libraries):
+                    rows = slice(int(issueOffsets[first + libraryId]) - start,
+                                 int(issueOffsets[first + libraryId + 1]) - start)
+                    library.issues.extendColumns(issueIds[start:end][rows].tolist(),
+                                                 table.creationDates[rows].view(numpy.int64),
+                                                 table.closingDates[rows].view(numpy.int64),
+                                                 table.firstCommentDates[rows].view(numpy.int64),
+                                                 flags[rows])
+        with Profiling.phase('rollups'):
+            rollupBuilder = Rollups.RollupBuilder()
+            rollupBuilder.addIssues(table)
+            domain.rollups = Rollups.DomainRollups.fromDomain(domain, rollupBuilder.build())
+        domain.issueDataOffset = self.manifest['issueDataOffset']
+
+
+def openStore(directory, keepIssues=True, keepIssueTable=True, manifest=None):
+    """The domains in the store, each loaded when it's passed to
+    domains.ensureLoaded. None when there's no usable store in directory"""
+    if manifest is None:
+        manifest = readManifest(directory)
+        if manifest is None:
+            return None
+
+    domains = DataStructures.Registry()
+    for domainInfo in manifest['domains']:
+        domain = domains.getOrCreateDomain(domainInfo['name'])
+        for libraryInfo in domainInfo['libraries']:
+            library = DataStructures.Library(libraryInfo['name'])
+            library.gitHubRepository = libraryInfo['gitHubRepository']
+            domains.addLibrary(domain, library)
+        domain.loaded = False
+    domains.loader = StoreLoader(directory, manifest, keepIssues, keepIssueTable)
+    return domains
+
+
+def main(arguments=None):
+    # the csv readers are only needed to make a store, not to read one
+    import DataParser
+    import SnapshotCache
+
+    parser = argparse.ArgumentParser(description='Convert the TableData csvs to the binary columnar store')
+    parser.add_argument('--data', default=DataParser.TABLE_DATA_DIRECTORY, help='the TableData directory')
+    parser.add_argument('--output', help='where to write the store, ' + STORE_DIRECTORY + ' in --data by default')
+    options = parser.parse_args(arguments)
+
+    directory = options.output or storePath(options.data)
+    SnapshotCache.saveStore(directory, options.data)
+    print('wrote ' + directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,400 @@
+# Serves the graphs and the numbers behind them over HTTP, so a team can share
+# one copy of the parsed data instead of everyone running the app:
+#
+#   python DashboardServer.py
+#   python DashboardServer.py --host 0.0.0.0 --port 8302 --workers 4
+#
+# and then:
+#
+#   /                                              every domain
+#   /domains                                       the domains and their libraries, as JSON
+#   /domains/testing/                              every graph of a domain
+#   /domains/testing/IssueClosingTimeGraph.png     one graph, .svg works too
+#   /domains/testing/metrics                       the numbers the graphs are drawn from, as JSON
+#   /ranking?domain=testing&top=5&popularity=2     Ranking.RankingIndex.topK, as JSON
+#
+# The graphs, the metrics and the domain pages take since, until (YYYY-MM-DD),
+# months, issueType and library, the same as BatchExport's options, and the
+# graphs take statistic as well. issueType and library can be given more than
+# once or separated by commas
+
+import argparse
+import asyncio
+import concurrent.futures
+import datetime
+import email.utils
+import hashlib
+import html
+import http
+import io
+import json
+import os
+import urllib.parse
+
+import BatchExport
+import DataParser
+import Graphs
+import Metrics
+import PlotCache
+import Ranking
+import SnapshotCache
+
+
+DEFAULT_PORT = 8302
+
+# the formats graphs are served in, and their content types
+IMAGE_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml'}
+JSON_TYPE = 'application/json'
+HTML_TYPE = 'text/html; charset=utf-8'
+
+# how long a kept alive connection can wait for its next request
+IDLE_SECONDS = 30
+# the longest request line or header line read
+MAX_LINE_BYTES = 8192
+MAX_HEADERS = 100
+
+# how much of the drawn graphs and JSON is kept, VIS_RESPONSE_CACHE_MB overrides it
+RESPONSE_CACHE_BYTES = int(float(os.environ.get('VIS_RESPONSE_CACHE_MB', 128)) * 1024 * 1024)
+
+
+class HttpError(Exception):
+    """Ends a request with status and the message as a JSON error"""
+
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+# Everything slow runs in the worker pool. Each worker has its own copy of the
+# registry, handed over once when it starts (with fork it's the parent's
+# memory, shared until written to), and keeps its graphs so the next request
+# for one only updates the artists already there
+
+workerDomains = None
+workerGraphs = {}
+workerPlotCache = None
+
+
+def startWorker(domains):
+    global workerDomains, workerPlotCache
+    workerDomains = domains
+    workerPlotCache = PlotCache.PlotCache()
+
+
+def renderGraph(domainName, graphName, query, statistic, fileFormat, dpi):
+    # the graph as the bytes of a png or svg file
+    graph = workerGraphs.get(graphName)
+    if graph is None:
+        graph = BatchExport.newGraph(graphName, plotCache=workerPlotCache)
+        workerGraphs[graphName] = graph
+    if isinstance(graph, Graphs.DurationGraph):
+        graph.statistic = statistic
+    graph.drawGraph(workerDomains.getDomain(domainName), query)
+    output = io.BytesIO()
+    graph.figure.savefig(output, format=fileFormat, dpi=dpi)
+    return output.getvalue()
+
+
+def jsonBytes(value):
+    # numpy numbers turn up in the metrics, item() makes them plain Python ones
+    return json.dumps(value, default=lambda number: number.item()).encode('utf-8')
+
+
+def metricsJson(domainName, query):
+    domain = workerDomains.getDomain(domainName)
+    libraries = []
+    for name, metrics in zip(Graphs.libraryNames(domain, query), Metrics.domainMetrics(domain, query)):
+        values = {'name': name}
+        values.update((attribute, getattr(metrics, attribute)) for attribute in Metrics.LibraryMetrics.__slots__)
+        libraries.append(values)
+    return jsonBytes({'domain': domain.name, 'libraries': libraries})
+
+
+def rankingJson(top, weights, domainName):
+    ranked = Ranking.rankingIndex(workerDomains).topK(top, weights, domainName)
+    return jsonBytes([{'domain': domain, 'library': library, 'score': score}
+                      for (domain, library, score) in ranked])
+
+
+def single(params, name, convert=str):
+    # the last value of a query string parameter, None when it isn't there
+    values = params.get(name)
+    if not values:
+        return None
+    try:
+        return convert(values[-1])
+    except ValueError:
+        raise HttpError(http.HTTPStatus.BAD_REQUEST, 'bad value for ' + name + ': ' + values[-1])
+
+
+def several(params, name):
+    # every value of a parameter given more than once or separated by commas
+    values = [value for text in params.get(name, []) for value in text.split(',') if value]
+    return values or None
+
+
+def queryFromParams(params):
+    options = argparse.Namespace(since=single(params, 'since', datetime.date.fromisoformat),
+                                 until=single(params, 'until', datetime.date.fromisoformat),
+                                 months=single(params, 'months', int),
+                                 issueTypes=several(params, 'issueType'),
+                                 libraries=several(params, 'library'))
+    if options.months is not None and options.since is not None:
+        raise HttpError(http.HTTPStatus.BAD_REQUEST, 'months and since can not be used together')
+    try:
+        return BatchExport.queryFromOptions(options)
+    except ValueError as error:
+        raise HttpError(http.HTTPStatus.BAD_REQUEST, str(error))
+
+
+def matchesETag(etag, ifNoneMatch):
+    tags = [tag.strip() for tag in ifNoneMatch.split(',')]
+    return '*' in tags or etag in tags or 'W/' + etag in tags
+
+
+def encodeResponse(status, headers, body, includeBody=True):
+    lines = ['HTTP/1.1 ' + str(int(status)) + ' ' + http.HTTPStatus(status).phrase,
+             'Date: ' + email.utils.formatdate(usegmt=True),
+             'Content-Length: ' + str(len(body))]
+    lines.extend(name + ': ' + value for name, value in headers)
+    head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+    return head + body if includeBody else head
+
+
+async def readHeaders(reader):
+    # the header lines after the request line, names lowercased
+    headers = {}
+    for count in range(MAX_HEADERS + 1):
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            return headers
+        (name, separator, value) = line.decode('latin-1').partition(':')
+        if separator:
+            headers[name.strip().lower()] = value.strip()
+    raise HttpError(http.HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, 'too many headers')
+
+
+class DashboardServer():
+    """Answers HTTP requests out of one registry loaded up front.
+
+    Each response has an ETag made from the registry's datasetVersion, the
+    domains' versions and everything the request asked for, so a client
+    asking again with If-None-Match gets a 304 until the data changes.
+    Drawn responses are kept under their ETag, and requests for something
+    that's still being drawn wait on that one drawing instead of starting
+    another. With workers set to 0 everything is drawn one at a time on a
+    thread of this process"""
+
+    def __init__(self, domains, workers=None, dpi=100, cacheBytes=RESPONSE_CACHE_BYTES):
+        self.domains = domains
+        self.dpi = dpi
+        for domain in domains:
+            # a worker can't load a domain itself, it might not be able to reach the loader
+            domains.ensureLoaded(domain)
+
+        if workers == 0:
+            self.pool = concurrent.futures.ThreadPoolExecutor(1, initializer=startWorker, initargs=(domains,))
+        else:
+            self.pool = concurrent.futures.ProcessPoolExecutor(workers, initializer=startWorker, initargs=(domains,))
+        # starts the workers now, before the event loop has any threads of its own
+        self.pool.submit(int).result()
+
+        self.responses = PlotCache.PlotCache(cacheBytes)
+        # ETag -> future of the body being worked out
+        self.pending = {}
+
+    def close(self):
+        self.pool.shutdown()
+
+    def dataVersion(self):
+        return (self.domains.datasetVersion, tuple((domain.name, domain.version) for domain in self.domains))
+
+    def etagOf(self, key):
+        digest = hashlib.sha1(repr((self.dataVersion(), key)).encode('utf-8')).hexdigest()
+        return '"' + digest[:32] + '"'
+
+    def domainOf(self, name):
+        domain = self.domains.getDomain(name)
+        if domain is None:
+            raise HttpError(http.HTTPStatus.NOT_FOUND, 'no domain called ' + name)
+        return domain
+
+    def route(self, path, params):
+        """(key, content type, function, arguments, pooled) for a request:
+        the key is everything the response depends on besides the data, and
+        pooled functions run in the worker pool"""
+        parts = [urllib.parse.unquote(part) for part in path.split('/') if part]
+
+        if not parts:
+            return (('index',), HTML_TYPE, self.indexPage, (), False)
+        if parts == ['domains']:
+            return (('domains',), JSON_TYPE, self.domainsJson, (), False)
+        if parts == ['ranking']:
+            weights = {name: single(params, name, float) for name in Ranking.RANKING_METRICS if name in params}
+            top = single(params, 'top', int)
+            domainName = single(params, 'domain')
+            if domainName is not None:
+                self.domainOf(domainName)
+            top = 10 if top is None else top
+            return (('ranking', top, tuple(sorted(weights.items())), domainName), JSON_TYPE,
+                    rankingJson, (top, weights or None, domainName), True)
+
+        if parts[0] != 'domains' or len(parts) > 3:
+            raise HttpError(http.HTTPStatus.NOT_FOUND, 'nothing at ' + path)
+        domain = self.domainOf(parts[1])
+        query = queryFromParams(params)
+        queryKey = None if query is None else query.key()
+
+        if len(parts) == 2:
+            # the page passes the parameters on as they were given
+            pageKey = tuple(sorted((name, tuple(values)) for name, values in params.items()))
+            return (('page', domain.name, pageKey), HTML_TYPE, self.domainPage, (domain, params), False)
+        if parts[2] == 'metrics':
+            return (('metrics', domain.name, queryKey), JSON_TYPE, metricsJson, (domain.name, query), True)
+
+        (graphName, dot, fileFormat) = parts[2].rpartition('.')
+        if graphName not in Graphs.GRAPHS_BY_NAME or fileFormat not in IMAGE_TYPES:
+            raise HttpError(http.HTTPStatus.NOT_FOUND, 'no graph called ' + parts[2])
+        statistic = single(params, 'statistic') or 'mean'
+        if statistic not in Graphs.STATISTICS:
+            raise HttpError(http.HTTPStatus.BAD_REQUEST, 'no statistic called ' + statistic)
+        return (('graph', domain.name, graphName, fileFormat, statistic, self.dpi, queryKey), IMAGE_TYPES[fileFormat],
+                renderGraph, (domain.name, graphName, query, statistic, fileFormat, self.dpi), True)
+
+    def indexPage(self):
+        links = ''.join('<li><a href="/domains/' + urllib.parse.quote(domain.name) + '/">' + html.escape(domain.name)
+                        + '</a></li>' for domain in self.domains)
+        return ('<!DOCTYPE html><title>Library comparisons</title><h1>Pick a domain to compare libraries</h1>'
+                '<ul>' + links + '</ul><p><a href="/ranking">Best libraries overall</a></p>').encode('utf-8')
+
+    def domainPage(self, domain, params):
+        queryString = urllib.parse.urlencode([(name, value) for name, values in params.items() for value in values])
+        suffix = '?' + queryString if queryString else ''
+        base = '/domains/' + urllib.parse.quote(domain.name) + '/'
+        images = ''.join('<h2>' + html.escape(graphClass.tabText) + '</h2><img src="'
+                         + html.escape(base + graphClass.__name__ + '.png' + suffix) + '" alt="'
+                         + html.escape(graphClass.tabText) + '">' for graphClass in Graphs.GRAPHS)
+        return ('<!DOCTYPE html><title>' + html.escape(domain.name) + '</title><p><a href="/">Go Home</a></p>'
+                '<h1>Comparing libraries for: ' + html.escape(domain.name) + '</h1><p><a href="'
+                + html.escape(base + 'metrics' + suffix) + '">Metrics as JSON</a></p>' + images).encode('utf-8')
+
+    def domainsJson(self):
+        return jsonBytes([{'name': domain.name, 'libraries': [library.name for library in domain.libraries]}
+                          for domain in self.domains])
+
+    async def body(self, etag, function, args, pooled):
+        cached = self.responses.get(etag)
+        if cached is not None:
+            return cached
+        if not pooled:
+            body = function(*args)
+            self.responses.put(etag, body, len(body))
+            return body
+
+        future = self.pending.get(etag)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.pool, function, *args)
+            self.pending[etag] = future
+            future.add_done_callback(lambda done: self.finished(etag, done))
+        try:
+            # a client that gives up mustn't cancel the drawing the others are waiting on
+            return await asyncio.shield(future)
+        except ValueError as error:
+            # what the Query, the Metrics and the Ranking raise for something they can't be asked
+            raise HttpError(http.HTTPStatus.BAD_REQUEST, str(error))
+
+    def finished(self, etag, future):
+        del self.pending[etag]
+        if not future.cancelled() and future.exception() is None:
+            self.responses.put(etag, future.result(), len(future.result()))
+
+    async def respond(self, method, target, headers):
+        # (status, headers, body)
+        if method not in ('GET', 'HEAD'):
+            raise HttpError(http.HTTPStatus.METHOD_NOT_ALLOWED, method + ' is not supported')
+        url = urllib.parse.urlsplit(target)
+        params = urllib.parse.parse_qs(url.query)
+        (key, contentType, function, args, pooled) = self.route(url.path, params)
+
+        etag = self.etagOf(key)
+        # there's nothing to lose by checking again, and the ETag changes with the data
+        cacheHeaders = [('ETag', etag), ('Cache-Control', 'no-cache')]
+        if matchesETag(etag, headers.get('if-none-match', '')):
+            return (http.HTTPStatus.NOT_MODIFIED, cacheHeaders, b'')
+        body = await self.body(etag, function, args, pooled)
+        return (http.HTTPStatus.OK, [('Content-Type', contentType)] + cacheHeaders, body)
+
+    async def handleConnection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    requestLine = await asyncio.wait_for(reader.readline(), IDLE_SECONDS)
+                except asyncio.TimeoutError:
+                    break
+                if not requestLine:
+                    break
+
+                method = 'GET'
+                keepAlive = False
+                try:
+                    headers = await readHeaders(reader)
+                    parts = requestLine.decode('latin-1').split()
+                    if len(parts) != 3 or not parts[2].startswith('HTTP/'):
+                        raise HttpError(http.HTTPStatus.BAD_REQUEST, 'bad request line')
+                    (method, target, version) = parts
+                    connection = headers.get('connection', '').lower()
+                    keepAlive = connection == 'keep-alive' or (version == 'HTTP/1.1' and connection != 'close')
+                    if headers.get('content-length', '0') != '0' or 'transfer-encoding' in headers:
+                        # nothing here takes a body, so there's no knowing where the next request starts
+                        keepAlive = False
+                    (status, responseHeaders, body) = await self.respond(method, target, headers)
+                except HttpError as error:
+                    (status, responseHeaders, body) = (error.status, [('Content-Type', JSON_TYPE)],
+                                                       jsonBytes({'error': str(error)}))
+                except Exception as error:
+                    print('could not answer ' + requestLine.decode('latin-1').strip() + ': ' + repr(error))
+                    (status, responseHeaders, body) = (http.HTTPStatus.INTERNAL_SERVER_ERROR,
+                                                       [('Content-Type', JSON_TYPE)],
+                                                       jsonBytes({'error': 'internal error'}))
+
+                responseHeaders.append(('Connection', 'keep-alive' if keepAlive else 'close'))
+                writer.write(encodeResponse(status, responseHeaders, body, method != 'HEAD'))
+                await writer.drain()
+                if not keepAlive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            # the client went away, or sent a line longer than MAX_LINE_BYTES
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=DEFAULT_PORT):
+        listener = await asyncio.start_server(self.handleConnection, host, port, limit=MAX_LINE_BYTES)
+        async with listener:
+            print('serving on http://' + host + ':' + str(port) + '/')
+            await listener.serve_forever()
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Serve the library comparison graphs and metrics over HTTP')
+    parser.add_argument('--host', default='127.0.0.1', help='0.0.0.0 to be reachable from the rest of the network')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='number of processes drawing graphs, one per core by default, 0 to draw on a thread')
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--data', default=DataParser.TABLE_DATA_DIRECTORY, help='the TableData directory')
+    options = parser.parse_args(arguments)
+
+    # the issues themselves aren't needed, only the tables the metrics filter
+    domains = SnapshotCache.loadTables(keepIssues=False, dataDirectory=options.data)
+    server = DashboardServer(domains, options.workers, options.dpi)
+    try:
+        asyncio.run(server.serve(options.host, options.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
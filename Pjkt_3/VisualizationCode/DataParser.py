@@ -1,9 +1,39 @@
 import csv
+import ColumnarStore
 import DataStructures
-import datetime
+import DateParsing
+import IssueTable
+import Profiling
+import Rollups
+import numpy
+import os
+
+
+TABLE_DATA_DIRECTORY = 'TableData'
+
+LIBRARY_INFO = 'Metric Data - Library Info.csv'
+POPULARITY = 'Metric Data - Popularity.csv'
+RELEASE_FREQUENCY = 'Metric Data - Release Frequency.csv'
+LAST_MODIFICATION_DATE = 'Metric Data - Last Modification Date.csv'
+BACKWARDS_COMPATIBILITY = 'Metric Data - Backwards Compatibility.csv'
+STACK_OVERFLOW = 'Metric Data - Last Discussed on Stack Overflow.csv'
+ISSUE_DATA = 'Metric Data - Issue Data.csv'
+
+TABLE_FILES = (LIBRARY_INFO, POPULARITY, RELEASE_FREQUENCY, LAST_MODIFICATION_DATE, BACKWARDS_COMPATIBILITY,
+               STACK_OVERFLOW, ISSUE_DATA)
+
+# the number of issue rows read from the file at a time while streaming it
+ISSUE_CHUNK_SIZE = 10000
+
+
+def tablePath(tableFile, dataDirectory=TABLE_DATA_DIRECTORY):
+    return os.path.join(dataDirectory, tableFile)
 
 
 def findLibraryInListOfDomains(domains, libraryName):
+    if isinstance(domains, DataStructures.Registry):
+        return domains.getLibrary(libraryName)
+
     for domain in domains:
         library = domain.containsLibraryWithName(libraryName)
         if library is not None:
@@ -12,187 +42,388 @@ def findLibraryInListOfDomains(domains, libraryName):
     return None
 
 
-def parseTables():
+def readChunks(reader, chunkSize=ISSUE_CHUNK_SIZE):
+    # groups the rows of a csv reader into lists of at most chunkSize rows
+    chunk = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) == chunkSize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class FileLines():
+    """The lines of a csv, minus its header, that start inside the byte range
+    [start, end). Splitting a file into ranges this way gives every line to
+    exactly one range, as long as no quoted field holds a newline.
+
+    position is the byte offset just past the last line handed out, which is
+    where a later read of rows appended to the file picks up. With
+    completeOnly set a last line without its newline is left for later, since
+    it may still be being written"""
+
+    def __init__(self, fileName, start=0, end=None, completeOnly=False):
+        self.fileName = fileName
+        self.start = start
+        self.end = end
+        self.completeOnly = completeOnly
+        self.position = start
+
+    def __iter__(self):
+        with open(self.fileName, 'rb') as dataFile:
+            if self.start == 0:
+                dataFile.readline()
+                self.position = dataFile.tell()
+            else:
+                # step back one byte so a line beginning right at start is kept
+                dataFile.seek(self.start - 1)
+                skipped = dataFile.readline()
+                self.position = self.start - 1 + len(skipped)
+
+            for line in dataFile:
+                if self.end is not None and self.position >= self.end:
+                    break
+                if self.completeOnly and not line.endswith(b'\n'):
+                    break
+                self.position += len(line)
+                if line.strip():
+                    yield line.decode('utf-8')
+
+
+def parseIssueRows(chunks, source=None):
+    # turns chunks of raw csv rows into chunks of columns
+    # (issueIds, libraryNames, creation, closing, firstComment, performance, security)
+    # with every date column converted in one go. source is the file the rows
+    # came from, for the error about a date that can't be read
+    for chunk in chunks:
+        (issueIds, libraryNames, creation, closing, firstComment, performance, security) = zip(*chunk)
+        with Profiling.phase('parse dates'):
+            columns = (issueIds, libraryNames,
+                       DateParsing.parseDateTimeColumn(creation, source),
+                       DateParsing.parseDateTimeColumn(closing, source),
+                       DateParsing.parseDateTimeColumn(firstComment, source),
+                       numpy.array(performance) == 'Yes',
+                       numpy.array(security) == 'Yes')
+        yield columns
+
+
+def readIssueChunks(lines, libraryIds, chunkSize=ISSUE_CHUNK_SIZE):
+    """Yields (issueIds, IssueTable, unknownLibraryNames) for each chunk of the
+    issue data in lines, a FileLines. libraryIds maps a library name
+    to the id it gets in the tables, rows for other libraries are dropped
+    before their dates are parsed"""
+    return issueRowChunks(csv.reader(lines), libraryIds, chunkSize, lines.fileName)
+
+
+def issueRowChunks(rows, libraryIds, chunkSize=ISSUE_CHUNK_SIZE, source=None):
+    # readIssueChunks for issue data rows that were already split into fields
+    def knownRows(chunks):
+        for chunk in chunks:
+            known = [row for row in chunk if row[1] in libraryIds]
+            unknown.extend(row[1] for row in chunk if row[1] not in libraryIds)
+            if known:
+                yield known
+
+    unknown = []
+    for (issueIds, libraryNames, creation, closing, firstComment, performance, security) in \
+            parseIssueRows(knownRows(readChunks(rows, chunkSize)), source):
+        ids = numpy.fromiter((libraryIds[libraryName] for libraryName in libraryNames),
+                             dtype=numpy.int32, count=len(libraryNames))
+        chunk = IssueTable.IssueTable(ids, creation, closing, firstComment, performance, security)
+        yield (list(issueIds), chunk, unknown)
+        unknown = []
+
+    if unknown:
+        yield ([], IssueTable.IssueTable.empty(), unknown)
+
+
+def reportUnknownLibraries(tableName, libraryNames):
+    for libraryName in libraryNames:
+        print("----------ERROR IN " + tableName + "----------")
+        print('library: /"' + libraryName + '/" not initialised')
+
+
+def addIssueTotals(libraries, stats, sketches):
+    # adds the per library arrays from IssueTable.libraryStats and the
+    # durations from IssueTable.durationSketches to each library's IssueStats
+    for libraryId in numpy.flatnonzero(stats['count']):
+        libraries[libraryId].issueStats.addTotals(
+            {attribute: stats[key][libraryId].item() for key, attribute in IssueTable.STAT_FIELDS.items()})
+        libraries[libraryId].issueStats.addSketchCounts(sketches['response'][libraryId], sketches['closing'][libraryId])
+        libraries[libraryId].changed()
+
+
+def addIssueObjects(libraries, issueIds, table):
+    # the issues go straight from the table's columns into each library's IssueList
+    flags = table.performance * DataStructures.PERFORMANCE + table.security * DataStructures.SECURITY
+    order = numpy.argsort(table.libraryIds, kind='stable')
+    bounds = numpy.searchsorted(table.libraryIds[order], numpy.arange(len(libraries) + 1))
+    for libraryId in numpy.flatnonzero(numpy.diff(bounds)):
+        rows = order[bounds[libraryId]:bounds[libraryId + 1]]
+        libraries[libraryId].issues.extendColumns(
+            [issueIds[row] for row in rows],
+            table.creationDates[rows].astype(numpy.int64),
+            table.closingDates[rows].astype(numpy.int64),
+            table.firstCommentDates[rows].astype(numpy.int64),
+            flags[rows].astype(numpy.uint8))
+        libraries[libraryId].changed()
+
+
+def setIssueTables(domains, table):
+    tables = table.splitByDomain(domains)
+    for domain in domains:
+        domain.issueTable = tables[domain.name]
+
+
+def setRollups(domains, issueRollups):
+    # issueRollups is a RollupBuilder's build() with the library ids counting
+    # through every domain, the release dates have to be in already
+    with Profiling.phase('rollups'):
+        split = Rollups.splitByDomain(issueRollups, domains)
+        for domain in domains:
+            domain.rollups = Rollups.DomainRollups.fromDomain(domain, split[domain.name])
+
+
+def ingestIssues(domains, fileName, keepIssues=True, keepIssueTable=True, chunkSize=ISSUE_CHUNK_SIZE):
+    """Streams the issue data file through in chunks, adding every issue to its
+    library's running IssueStats and to the domains' Rollups. Issue objects
+    are only kept in library.issues when keepIssues is set, and each domain
+    gets a columnar IssueTable when keepIssueTable is set"""
+    libraries = [library for domain in domains for library in domain.libraries]
+    libraryIds = {library.name: libraryId for libraryId, library in enumerate(libraries)}
+    builder = IssueTable.IssueTableBuilder()
+    rollupBuilder = Rollups.RollupBuilder()
+
+    lines = FileLines(fileName)
+    for (issueIds, chunk, unknown) in readIssueChunks(lines, libraryIds, chunkSize):
+        reportUnknownLibraries('issue data', unknown)
+        with Profiling.phase('build model'):
+            addIssueTotals(libraries, chunk.libraryStats(len(libraries)), chunk.durationSketches(len(libraries)))
+            rollupBuilder.addIssues(chunk)
+
+            if keepIssueTable:
+                builder.addTable(chunk)
+
+            if keepIssues:
+                addIssueObjects(libraries, issueIds, chunk)
 
-    domains = []
-    k = 0
+    if keepIssueTable:
+        with Profiling.phase('build model'):
+            setIssueTables(domains, builder.build())
+    setRollups(domains, rollupBuilder.build())
+
+    for domain in domains:
+        domain.issueDataOffset = lines.position
+
+
+def readLibraryInfo(fileName):
+    # the registry indexes domains and libraries by name, so every lookup
+    # afterwards is a dict hit instead of a walk over all the domains
+    domains = DataStructures.Registry()
     # read the Library info data and make domains and add the libraries to them
-    with open('TableData/Metric Data - Library Info.csv') as csvfile:
+    with open(fileName) as csvfile:
         reader = csv.reader(csvfile)
         next(reader)
         for (libraryName, gitHubRepo, domainName) in reader:
-            domain = DataStructures.Domain.arrayContainsWithName(domains, domainName)
-            if domain is None:
-                domain = DataStructures.Domain(domainName)
-                domains.append(domain)
+            domain = domains.getOrCreateDomain(domainName)
 
             library = domain.containsLibraryWithName(libraryName)
             if library is None:
                 library = DataStructures.Library(libraryName)
-                domain.addLibrary(library)
+                domains.addLibrary(domain, library)
 
             library.gitHubRepository = gitHubRepo
 
+    return domains
 
-    # add popularity data
-    with open('TableData/Metric Data - Popularity.csv') as csvfile:
-        # start reading the file
-        reader = csv.reader(csvfile)
-        next(reader) # skips the first line of the file because its the header
-        # for each line of data in the file
-        for (libraryName, popularityCount) in reader:
-            # find the library with that matches this line in the file
-            library = findLibraryInListOfDomains(domains, libraryName)
-            # if the library wasn't found then skip this line
-            if library is None:
-                print("----------ERROR IN Popularity Data----------")
-                print('library: /"' + libraryName + '/" not initialised')
-                continue
-            library.popularity = popularityCount
-
-
-    # add Release data
-    with open('TableData/Metric Data - Release Frequency.csv') as csvfile:
-        reader = csv.reader(csvfile)
-        header = next(reader)
-        data = []
-        for array in reader:
-            data.append(array)
 
-        for domain in domains:
-            i = -1
-            for library in domain.libraries:
-                for idx, val in enumerate(header):
-                    if library.name in val:
-                        i = idx
-                for line in data:
-                    if line[i] == '':
-                        break
-                    dateStrs = line[i].split("-")
-                    library.releaseDates.append(datetime.date(int(dateStrs[0]), int(dateStrs[1]), int(dateStrs[2])))
-
-                library.releaseDates.sort()
+# The readers below only return plain values keyed by library name, so they
+# can run in another process, and the apply functions put the values on the
+# libraries afterwards
 
-    # adds last mod data
-    with open('TableData/Metric Data - Last Modification Date.csv') as csvfile:
+def readPopularity(fileName):
+    with open(fileName) as csvfile:
+        # start reading the file
         reader = csv.reader(csvfile)
-        next(reader)
-
-        for (libraryName, lastModDate) in reader:
-            library = findLibraryInListOfDomains(domains, libraryName)
-
-            if library is None:
-                print("----------ERROR IN Last Mod Date----------")
-                print('library: /"' + libraryName + '/" not initialised')
-                continue
-            dateStrs = lastModDate.split("-")
-            library.lastModificationDate = datetime.date(int(dateStrs[0]), int(dateStrs[1]), int(dateStrs[2]))
-
-    # adds backwards compatibility data
-    with open('TableData/Metric Data - Backwards Compatibility.csv') as csvfile:
+        next(reader) # skips the first line of the file because its the header
+        return [(libraryName, popularityCount) for (libraryName, popularityCount) in reader]
+
+
+def applyPopularity(domains, values):
+    for (libraryName, popularityCount) in values:
+        # find the library with that matches this line in the file
+        library = domains.getLibrary(libraryName)
+        # if the library wasn't found then skip this line
+        if library is None:
+            reportUnknownLibraries('Popularity Data', [libraryName])
+            continue
+        library.popularity = popularityCount
+        library.changed()
+
+
+def readWideTable(fileName, libraryNames, tableName):
+    """Reads a table with one column per library, headed '... for <library>',
+    in a single pass. Returns the cells of each library's column, as
+    (first cell of the row, cell) pairs, up to the column's first blank"""
+    with open(fileName) as csvfile:
         reader = csv.reader(csvfile)
-
         header = next(reader)
 
-        data = []
+        # exact header -> column index, so 'log4j' can't pick up 'log4j2'
+        columnIndex = {}
+        for idx, val in enumerate(header):
+            (prefix, separator, libraryName) = val.partition(' for ')
+            if separator:
+                columnIndex.setdefault(libraryName, idx)
+
+        missing = [libraryName for libraryName in libraryNames if libraryName not in columnIndex]
+        for libraryName in missing:
+            print("----------ERROR IN " + tableName + "----------")
+            print('library: /"' + libraryName + '/" has no column')
+
+        series = {libraryName: [] for libraryName in libraryNames}
+        active = [(libraryName, columnIndex[libraryName]) for libraryName in libraryNames
+                  if libraryName in columnIndex]
         for line in reader:
-            data.append(line)
-
-        for domain in domains:
-            i = -1
-            for library in domain.libraries:
-                for idx, val in enumerate(header):
-                    if library.name in val:
-                        i = idx
-                        break
-
-                for line in data:
-                    if line[i] == '':
-                        break
-                    library.breakingChangesPerRelease.append((line[0], int(line[i])))
-
-
-
-    # adds stackoverflow data
-    with open('TableData/Metric Data - Last Discussed on Stack Overflow.csv') as csvfile:
-        reader = csv.reader(csvfile)
-        next(reader)
+            if not active:
+                break
+            stillActive = []
+            for (libraryName, i) in active:
+                # a column ends at its first blank cell
+                if i < len(line) and line[i] != '':
+                    series[libraryName].append((line[0], line[i]))
+                    stillActive.append((libraryName, i))
+            active = stillActive
 
-        for (libraryName, lastDiscussed, numOfQuestions) in reader:
-            library = findLibraryInListOfDomains(domains, libraryName)
-            if library is None:
-                print("----------ERROR IN Discussed on stack overflow----------")
-                print('library: /"' + libraryName + '/" not initialised')
-                continue
+    return series
 
 
-            if lastDiscussed == 'Never':
-                library.lastDiscussedOnStackOverflow = lastDiscussed
-            else:
-                dateStrs = lastDiscussed.split("-")
-                library.lastDiscussedOnStackOverflow = datetime.date(int(dateStrs[0]), int(dateStrs[1]), int(dateStrs[2]))
+def readReleaseFrequency(fileName, libraryNames):
+    releaseDates = {}
+    for libraryName, cells in readWideTable(fileName, libraryNames, 'Release Frequency').items():
+        column = [cell for (first, cell) in cells]
+        with Profiling.phase('parse dates'):
+            dates = DateParsing.parseDateColumn(column, fileName)
+            releaseDates[libraryName] = sorted(dates[~numpy.isnat(dates)].tolist())
+    return releaseDates
 
-            library.questionsAsked = numOfQuestions
 
+def applyReleaseFrequency(domains, releaseDates):
+    for libraryName, dates in releaseDates.items():
+        library = domains.getLibrary(libraryName)
+        library.releaseDates = library.releaseDates + tuple(dates)
 
 
-    # adds issue data
-    with open('TableData/Metric Data - Issue Data.csv') as csvfile:
+def readLastModification(fileName):
+    with open(fileName) as csvfile:
         reader = csv.reader(csvfile)
         next(reader)
+        return [(libraryName, DateParsing.parseDate(lastModDate, fileName)) for (libraryName, lastModDate) in reader]
 
-        for (issueId, libraryName, issueCreationDate, issueClosingDate, firstComment, performance, security) in reader:
-            library = findLibraryInListOfDomains(domains, libraryName)
-            if library is None:
-                print("----------ERROR IN issue data----------")
-                print('library: /"' + libraryName + '/" not initialised')
-                continue
 
-            issue = DataStructures.Issue()
-            issue.id = issueId
+def applyLastModification(domains, values):
+    for (libraryName, lastModDate) in values:
+        library = domains.getLibrary(libraryName)
 
-            if issueCreationDate != 'None':
-                dateStrs = issueCreationDate.replace(' ', '-').replace(':', '-').split("-")
-                issue.creationDate = datetime.datetime(int(dateStrs[0]), int(dateStrs[1]), int(dateStrs[2]), int(dateStrs[3]), int(dateStrs[4]), int(dateStrs[5]))
-                # issue.creationDate = datetime.datetime.strptime(issueCreationDate, "%Y-%m-%d %H:%M:%S")
+        if library is None:
+            reportUnknownLibraries('Last Mod Date', [libraryName])
+            continue
+        library.lastModificationDate = lastModDate
+        library.changed()
 
-            if issueClosingDate != 'None':
-                dateStrs = issueClosingDate.replace(' ', '-').replace(':', '-').split("-")
-                issue.closingDate = datetime.datetime(int(dateStrs[0]), int(dateStrs[1]), int(dateStrs[2]),
-                                                       int(dateStrs[3]), int(dateStrs[4]), int(dateStrs[5]))
 
-            if firstComment != 'None':
-                dateStrs = firstComment.replace(' ', '-').replace(':', '-').split("-")
-                issue.firstCommentDate = datetime.datetime(int(dateStrs[0]), int(dateStrs[1]), int(dateStrs[2]),
-                                                       int(dateStrs[3]), int(dateStrs[4]), int(dateStrs[5]))
+def readBackwardsCompatibility(fileName, libraryNames):
+    return {libraryName: [(release, int(changes)) for (release, changes) in cells]
+            for libraryName, cells in readWideTable(fileName, libraryNames, 'Backwards Compatibility').items()}
 
-            issue.performance = performance == 'Yes'
-            issue.security = security == 'Yes'
 
-            library.issues.append(issue)
-
-
-    return domains
+def applyBackwardsCompatibility(domains, breakingChanges):
+    for libraryName, changes in breakingChanges.items():
+        library = domains.getLibrary(libraryName)
+        library.breakingChangesPerRelease.extend(changes)
+        library.changed()
 
 
+def readStackOverflow(fileName):
+    values = []
+    with open(fileName) as csvfile:
+        reader = csv.reader(csvfile)
+        next(reader)
 
+        for (libraryName, lastDiscussed, numOfQuestions) in reader:
+            # the graphs look for 'Never' so that's kept as is
+            if not DateParsing.isMissing(lastDiscussed):
+                lastDiscussed = DateParsing.parseDate(lastDiscussed, fileName)
+            values.append((libraryName, lastDiscussed, numOfQuestions))
 
+    return values
 
 
+def applyStackOverflow(domains, values):
+    for (libraryName, lastDiscussed, numOfQuestions) in values:
+        library = domains.getLibrary(libraryName)
+        if library is None:
+            reportUnknownLibraries('Discussed on stack overflow', [libraryName])
+            continue
 
+        library.lastDiscussedOnStackOverflow = lastDiscussed
+        library.questionsAsked = numOfQuestions
+        library.changed()
 
 
+def openColumnar(keepIssues=True, keepIssueTable=True, dataDirectory=TABLE_DATA_DIRECTORY):
+    """The domains in the binary columnar copy of the tables in the data
+    directory (see ColumnarStore), or None when it hasn't been made. Nothing
+    is parsed, each domain's columns are mapped in when it's first passed to
+    domains.ensureLoaded. SnapshotCache.readStore also checks the copy is
+    still current"""
+    return ColumnarStore.openStore(ColumnarStore.storePath(dataDirectory), keepIssues, keepIssueTable)
 
 
+def libraryNamesOf(domains):
+    return [library.name for domain in domains for library in domain.libraries]
 
 
+def applyLibraryTables(domains, dataDirectory=TABLE_DATA_DIRECTORY):
+    # everything but Library Info and Issue Data, for every library at once
+    libraryNames = libraryNamesOf(domains)
 
+    # add popularity data
+    with Profiling.phase(POPULARITY):
+        applyPopularity(domains, readPopularity(tablePath(POPULARITY, dataDirectory)))
 
+    # add Release data
+    with Profiling.phase(RELEASE_FREQUENCY):
+        applyReleaseFrequency(domains, readReleaseFrequency(tablePath(RELEASE_FREQUENCY, dataDirectory),
+                                                            libraryNames))
 
+    # adds last mod data
+    with Profiling.phase(LAST_MODIFICATION_DATE):
+        applyLastModification(domains, readLastModification(tablePath(LAST_MODIFICATION_DATE, dataDirectory)))
 
+    # adds backwards compatibility data
+    with Profiling.phase(BACKWARDS_COMPATIBILITY):
+        applyBackwardsCompatibility(domains, readBackwardsCompatibility(
+            tablePath(BACKWARDS_COMPATIBILITY, dataDirectory), libraryNames))
 
+    # adds stackoverflow data
+    with Profiling.phase(STACK_OVERFLOW):
+        applyStackOverflow(domains, readStackOverflow(tablePath(STACK_OVERFLOW, dataDirectory)))
 
 
+def parseTables(keepIssues=True, keepIssueTable=True, dataDirectory=TABLE_DATA_DIRECTORY):
+    # each table is its own phase when Profiling is on
+    with Profiling.phase('parseTables'):
+        with Profiling.phase(LIBRARY_INFO):
+            domains = readLibraryInfo(tablePath(LIBRARY_INFO, dataDirectory))
 
+        applyLibraryTables(domains, dataDirectory)
 
+        # adds issue data
+        with Profiling.phase(ISSUE_DATA):
+            ingestIssues(domains, tablePath(ISSUE_DATA, dataDirectory), keepIssues=keepIssues,
+                         keepIssueTable=keepIssueTable)
 
+    return domains
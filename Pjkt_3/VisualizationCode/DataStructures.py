@@ -1,5 +1,11 @@
 # DataStructures.py
 
+import array
+import bisect
+
+import DateParsing
+import Sketches
+
 
 
 class Domain():
@@ -9,9 +15,21 @@ class Domain():
 		super(Domain, self).__init__()
 		self.name = name
 		self.libraries = []
+		self.librariesByName = {}
+		self.issueTable = None
+		# the domain's issues and releases summed by day, month and year, see Rollups
+		self.rollups = None
+		# False until the per library tables have been read for a lazily loaded domain
+		self.loaded = True
+		# how far into the Issue Data file this domain's issues have been read
+		self.issueDataOffset = 0
+		# goes up every time the domain's data changes, so anything computed
+		# from the domain can tell when it's stale
+		self.version = 0
 
 	def addLibrary(self, library):
 		self.libraries.append(library)
+		self.librariesByName[library.name] = library
 
 	def getLibrary(self, index):
 		return self.libraries[index]
@@ -21,6 +39,9 @@ class Domain():
 
 	@staticmethod
 	def arrayContainsWithName(array, name):
+		if isinstance(array, Registry):
+			return array.getDomain(name)
+
 		for domain in array:
 			if domain.name == name:
 				return domain
@@ -28,42 +49,266 @@ class Domain():
 		return None
 
 	def containsLibraryWithName(self, name):
-		for library in self.libraries:
-			if library.name == name:
-				return library
+		return self.librariesByName.get(name)
 
-		return None
+
+
+class Registry():
+
+	"""Holds every domain and indexes the domains and libraries by name so
+	the parser and the graphs never have to scan for them"""
+	def __init__(self):
+		super(Registry, self).__init__()
+		self.domains = []
+		self.domainsByName = {}
+		self.librariesByName = {}
+		# set by SnapshotCache to a hash of the TableData the domains came from
+		self.datasetVersion = None
+		# reads a domain's tables the first time it's needed, see LazyLoading
+		self.loader = None
+		# the (domain versions, RankingIndex) Ranking last worked out
+		self.ranking = None
+
+	def __iter__(self):
+		return iter(self.domains)
+
+	def __len__(self):
+		return len(self.domains)
+
+	def getDomain(self, name):
+		return self.domainsByName.get(name)
+
+	def getLibrary(self, name):
+		return self.librariesByName.get(name)
+
+	def addDomain(self, domain):
+		self.domains.append(domain)
+		self.domainsByName[domain.name] = domain
+		for library in domain.libraries:
+			self.librariesByName[library.name] = library
+
+	def addLibrary(self, domain, library):
+		domain.addLibrary(library)
+		self.librariesByName[library.name] = library
+
+	def ensureLoaded(self, domain):
+		if not domain.loaded and self.loader is not None:
+			self.loader.loadDomain(self, domain)
+			domain.loaded = True
+			domain.version += 1
+		return domain
+
+	def getOrCreateDomain(self, name):
+		domain = self.domainsByName.get(name)
+		if domain is None:
+			domain = Domain(name)
+			self.addDomain(domain)
+		return domain
 
 
 
 class Library():
 
+	# slots instead of a __dict__ per library, and the release dates are kept
+	# as an array of epoch days behind the releaseDates property
+	__slots__ = ('name', 'gitHubRepository', 'popularity', '_releaseDays', 'lastModificationDate',
+		'breakingChangesPerRelease', 'lastDiscussedOnStackOverflow', 'questionsAsked', 'issues', 'issueStats',
+		'version', 'metrics')
+
 	def __init__(self, name):
 		super(Library, self).__init__()
 		self.name = name
 		self.gitHubRepository = ""
 
 		self.popularity = 0
-		self.releaseDates = []
+		self._releaseDays = array.array('i')
 		self.lastModificationDate = None
 		self.breakingChangesPerRelease = []
 		self.lastDiscussedOnStackOverflow = None
 		self.questionsAsked = 0
-		self.issues = []
+		self.issues = IssueList()
+		self.issueStats = IssueStats()
+
+		# version goes up whenever the parser changes the library's data, and
+		# metrics is the (version, LibraryMetrics) Metrics last worked out
+		self.version = 0
+		self.metrics = None
+
+	def changed(self):
+		self.version += 1
+
+	@property
+	def releaseDates(self):
+		# a tuple, so changing it in place fails instead of being lost;
+		# assign to releaseDates to change them
+		return tuple(DateParsing.fromEpochDay(day) for day in self._releaseDays)
+
+	@releaseDates.setter
+	def releaseDates(self, dates):
+		# kept sorted so a range of dates can be found by bisecting
+		self._releaseDays = array.array('i', sorted(DateParsing.toEpochDay(date) for date in dates))
+		self.changed()
 
+	def setReleaseDays(self, days):
+		# epoch days that are already sorted, straight from ColumnarStore
+		self._releaseDays = array.array('i', [int(day) for day in days])
+
+	def releaseDatesBetween(self, start=None, end=None):
+		"""The release dates from start up to but not including end, either
+		of which can be None to leave that side open"""
+		low = 0 if start is None else bisect.bisect_left(self._releaseDays, DateParsing.toEpochDay(start))
+		high = len(self._releaseDays) if end is None else bisect.bisect_left(self._releaseDays, DateParsing.toEpochDay(end))
+		return tuple(DateParsing.fromEpochDay(day) for day in self._releaseDays[low:high])
+
+
+
+# bits of Issue.flags
+PERFORMANCE = 1
+SECURITY = 2
 
 
 class Issue():
 
+	# dates are kept as epoch seconds (DateParsing.NOT_A_TIME for none) and
+	# the two flags share one int, the properties turn them back into
+	# datetimes and bools
+	__slots__ = ('id', '_creationDate', '_closingDate', '_firstCommentDate', 'flags')
 
 	def __init__(self):
 		super(Issue, self).__init__()
 		self.id = 0
-		self.creationDate = None
-		self.closingDate = None
-		self.firstCommentDate = None
-		self.performance = False
-		self.security = False
+		self._creationDate = DateParsing.NOT_A_TIME
+		self._closingDate = DateParsing.NOT_A_TIME
+		self._firstCommentDate = DateParsing.NOT_A_TIME
+		self.flags = 0
+
+	@property
+	def creationDate(self):
+		return DateParsing.fromEpochSeconds(self._creationDate)
+
+	@creationDate.setter
+	def creationDate(self, date):
+		self._creationDate = DateParsing.toEpochSeconds(date)
+
+	@property
+	def closingDate(self):
+		return DateParsing.fromEpochSeconds(self._closingDate)
+
+	@closingDate.setter
+	def closingDate(self, date):
+		self._closingDate = DateParsing.toEpochSeconds(date)
+
+	@property
+	def firstCommentDate(self):
+		return DateParsing.fromEpochSeconds(self._firstCommentDate)
+
+	@firstCommentDate.setter
+	def firstCommentDate(self, date):
+		self._firstCommentDate = DateParsing.toEpochSeconds(date)
+
+	@property
+	def performance(self):
+		return bool(self.flags & PERFORMANCE)
+
+	@performance.setter
+	def performance(self, value):
+		self.flags = self.flags | PERFORMANCE if value else self.flags & ~PERFORMANCE
+
+	@property
+	def security(self):
+		return bool(self.flags & SECURITY)
+
+	@security.setter
+	def security(self, value):
+		self.flags = self.flags | SECURITY if value else self.flags & ~SECURITY
+
+
+
+class IssueList():
+
+	"""A library's issues stored as one array per field rather than one object
+	per issue. It reads like a list of Issue objects, which are made on the
+	fly when they're indexed or iterated over"""
+	def __init__(self):
+		super(IssueList, self).__init__()
+		self.ids = []
+		self.creationDates = array.array('q')
+		self.closingDates = array.array('q')
+		self.firstCommentDates = array.array('q')
+		self.flags = array.array('B')
+
+	def __len__(self):
+		return len(self.ids)
+
+	def __getitem__(self, index):
+		# a slice gives a plain list of Issues, like slicing a list does
+		if isinstance(index, slice):
+			return [self[position] for position in range(len(self.ids))[index]]
+		issue = Issue()
+		issue.id = self.ids[index]
+		issue._creationDate = self.creationDates[index]
+		issue._closingDate = self.closingDates[index]
+		issue._firstCommentDate = self.firstCommentDates[index]
+		issue.flags = self.flags[index]
+		return issue
+
+	def __iter__(self):
+		for index in range(len(self.ids)):
+			yield self[index]
+
+	def append(self, issue):
+		self.ids.append(issue.id)
+		self.creationDates.append(issue._creationDate)
+		self.closingDates.append(issue._closingDate)
+		self.firstCommentDates.append(issue._firstCommentDate)
+		self.flags.append(issue.flags)
+
+	def extendColumns(self, ids, creationDates, closingDates, firstCommentDates, flags):
+		# adds many issues at once from columns of epoch seconds and flag bits
+		self.ids.extend(ids)
+		self.creationDates.extend(creationDates)
+		self.closingDates.extend(closingDates)
+		self.firstCommentDates.extend(firstCommentDates)
+		self.flags.extend(flags)
+
+
+
+class IssueStats():
+
+	"""Running totals over a library's issues, enough for the graphs to get
+	their counts, averages and percentiles without keeping every Issue around"""
+	__slots__ = ('count', 'performanceCount', 'securityCount', 'genericCount', 'responseSeconds',
+		'responseCount', 'unansweredCount', 'closingSeconds', 'closingCount', 'openCount', 'responseSketch',
+		'closingSketch')
+
+	def __init__(self):
+		super(IssueStats, self).__init__()
+		self.count = 0
+		self.performanceCount = 0
+		self.securityCount = 0
+		self.genericCount = 0
+
+		self.responseSeconds = 0
+		self.responseCount = 0
+		self.unansweredCount = 0
+
+		self.closingSeconds = 0
+		self.closingCount = 0
+		self.openCount = 0
+
+		# the response and closing times, for their percentiles
+		self.responseSketch = Sketches.Sketch()
+		self.closingSketch = Sketches.Sketch()
+
+	def addTotals(self, totals):
+		# totals maps attribute names to how much to add to them
+		for name, value in totals.items():
+			setattr(self, name, getattr(self, name) + value)
+
+	def addSketchCounts(self, responseCounts, closingCounts):
+		# histograms over Sketches.BINS, like the rows IssueTable.durationSketches gives
+		self.responseSketch.addCounts(responseCounts)
+		self.closingSketch.addCounts(closingCounts)
 
 
 
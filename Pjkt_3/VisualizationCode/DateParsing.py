@@ -0,0 +1,169 @@
+import datetime
+import numpy
+
+
+# values the TableData csvs use in place of a date
+MISSING_DATES = ('None', 'Never', '')
+
+NOT_A_TIME = numpy.iinfo(numpy.int64).min
+
+EPOCH = datetime.date(1970, 1, 1)
+
+
+def isMissing(dateStr):
+    return dateStr in MISSING_DATES
+
+
+def _notADate(dateStr, source):
+    # source is the file the string came from, when it's known
+    return ValueError('not a date: ' + repr(dateStr) + ('' if source is None else ' in ' + source))
+
+
+def dayNumber(dateStr, source=None):
+    """The number of days between the epoch and a 'YYYY-MM-DD' string, or
+    NOT_A_TIME for one of the MISSING_DATES. The month and day don't have to
+    be padded, anything else that isn't a date raises a ValueError"""
+    if isMissing(dateStr):
+        return NOT_A_TIME
+    try:
+        (year, month, day) = (int(field) for field in dateStr.split("-"))
+        return (datetime.date(year, month, day) - EPOCH).days
+    except ValueError:
+        raise _notADate(dateStr, source) from None
+
+
+def epochSeconds(dateTimeStr, source=None):
+    """The seconds since the epoch for a 'YYYY-MM-DD HH:MM:SS' string, or
+    NOT_A_TIME for one of the MISSING_DATES. Left out time fields count as 0,
+    and anything after the seconds, like a '-07:00' offset, is ignored"""
+    if isMissing(dateTimeStr):
+        return NOT_A_TIME
+    (dateStr, separator, timeStr) = dateTimeStr.strip().partition(' ')
+    try:
+        fields = [int(field) for field in timeStr.replace('-', ':').replace('+', ':').split(':')[:3]] if timeStr else []
+        time = datetime.time(*fields)
+        day = dayNumber(dateStr)
+    except (ValueError, TypeError):
+        raise _notADate(dateTimeStr, source) from None
+    if day == NOT_A_TIME:
+        raise _notADate(dateTimeStr, source)
+    return day * 86400 + time.hour * 3600 + time.minute * 60 + time.second
+
+
+def toEpochSeconds(dateTime):
+    if dateTime is None:
+        return NOT_A_TIME
+    return (dateTime.date() - EPOCH).days * 86400 + dateTime.hour * 3600 + dateTime.minute * 60 + dateTime.second
+
+
+def fromEpochSeconds(seconds):
+    if seconds == NOT_A_TIME:
+        return None
+    return datetime.datetime(1970, 1, 1) + datetime.timedelta(seconds=seconds)
+
+
+def toEpochDay(date):
+    if date is None:
+        return NOT_A_TIME
+    return (date - EPOCH).days
+
+
+def fromEpochDay(day):
+    if day == NOT_A_TIME:
+        return None
+    return EPOCH + datetime.timedelta(days=day)
+
+
+def parseDate(dateStr, source=None):
+    """A single 'YYYY-MM-DD' string as a datetime.date, None when missing"""
+    return fromEpochDay(dayNumber(dateStr, source))
+
+
+# the column parsers read 'YYYY-MM-DD' and 'YYYY-MM-DD HH:MM:SS' straight out
+# of the strings' bytes, the rows shaped any other way go through dayNumber
+# and epochSeconds one at a time
+DATE_WIDTH = 10
+
+
+def _characters(strings, width):
+    # the strings as a matrix of their first width bytes, one row each,
+    # shorter ones padded with zero bytes
+    strings = strings.astype('S' + str(width))
+    return strings.view(numpy.uint8).reshape(len(strings), width)
+
+
+def _isDigits(characters):
+    return ((characters >= ord('0')) & (characters <= ord('9'))).all(axis=1)
+
+
+def _number(digits):
+    # the columns of a matrix of digits as one number per row
+    number = numpy.zeros(len(digits), dtype=numpy.int64)
+    for column in range(digits.shape[1]):
+        number = number * 10 + digits[:, column] - ord('0')
+    return number
+
+
+def _days(characters):
+    """The day numbers of the 'YYYY-MM-DD' each row starts with, and which
+    rows do start with one"""
+    dates = characters[:, :DATE_WIDTH]
+    parsed = (_isDigits(dates[:, [0, 1, 2, 3, 5, 6, 8, 9]]) & (dates[:, 4] == ord('-')) & (dates[:, 7] == ord('-'))
+              & (_number(dates[:, 5:7]) - 1 < 12) & (_number(dates[:, 8:10]) - 1 < 31))
+    dates = numpy.ascontiguousarray(dates).view('S' + str(DATE_WIDTH)).ravel()
+    # the rest still have to be a day numpy can read
+    dates[~parsed] = b'1970-01-01'
+    return (dates.astype('datetime64[D]').view(numpy.int64), parsed)
+
+
+def _dateColumn(characters):
+    (days, parsed) = _days(characters)
+    # nothing after the day
+    return (days, parsed & (characters[:, DATE_WIDTH] == 0))
+
+
+def _dateTimeColumn(characters):
+    (days, parsed) = _days(characters)
+
+    # 'H:MM:SS' is shifted into 'HH:MM:SS' with a leading '0', which leaves
+    # whatever comes after the seconds in the last column
+    times = characters[:, DATE_WIDTH + 1:].copy()
+    singleDigitHour = times[:, 1] == ord(':')
+    times[singleDigitHour, 1:] = times[singleDigitHour, :-1]
+    times[singleDigitHour, 0] = ord('0')
+
+    (hours, minutes, seconds) = (_number(times[:, 0:2]), _number(times[:, 3:5]), _number(times[:, 6:8]))
+    parsed &= ((characters[:, DATE_WIDTH] == ord(' ')) & _isDigits(times[:, [0, 1, 3, 4, 6, 7]])
+               & (times[:, 2] == ord(':')) & (times[:, 5] == ord(':')) & numpy.isin(times[:, 8], (0, ord('-'), ord('+')))
+               & (hours < 24) & (minutes < 60) & (seconds < 60))
+    return (days * 86400 + hours * 3600 + minutes * 60 + seconds, parsed)
+
+
+def _parseColumn(dateStrs, width, parseFast, parse, unit, source):
+    strings = numpy.asarray(dateStrs, dtype=str)
+    values = numpy.full(len(strings), NOT_A_TIME, dtype=numpy.int64)
+    try:
+        (fast, parsed) = parseFast(_characters(strings, width))
+        values[parsed] = fast[parsed]
+    except (UnicodeEncodeError, ValueError):
+        # a string that isn't ASCII or a day numpy won't take, like
+        # '2017-02-30', parse turns it into an error naming it
+        parsed = numpy.zeros(len(strings), dtype=bool)
+
+    for row in numpy.flatnonzero(~parsed & ~numpy.isin(strings, MISSING_DATES)):
+        values[row] = parse(str(strings[row]), source)
+    return values.view('datetime64[' + unit + ']')
+
+
+def parseDateColumn(dateStrs, source=None):
+    """A whole column of 'YYYY-MM-DD' strings as datetime64[D], NaT for the
+    missing ones. Raises a ValueError naming the first string, and source,
+    that isn't a date"""
+    return _parseColumn(dateStrs, DATE_WIDTH + 1, _dateColumn, dayNumber, 'D', source)
+
+
+def parseDateTimeColumn(dateTimeStrs, source=None):
+    """A whole column of 'YYYY-MM-DD HH:MM:SS' strings as datetime64[s], NaT
+    for the missing ones. Raises a ValueError naming the first string, and
+    source, that isn't a date and time"""
+    return _parseColumn(dateTimeStrs, DATE_WIDTH + 10, _dateTimeColumn, epochSeconds, 's', source)
@@ -0,0 +1,62 @@
+import numpy
+
+
+def minMaxDownsample(x, y, buckets):
+    """Thins a series sorted by x down to at most two points per bucket, the
+    lowest and the highest, with the buckets splitting the x range evenly.
+    Given the axis width in pixels as the number of buckets the line looks the
+    same, since every point dropped was drawn inside the pixel column of one
+    that's kept"""
+    x = numpy.asarray(x, dtype=numpy.float64)
+    y = numpy.asarray(y, dtype=numpy.float64)
+    if len(x) <= 2 * buckets or x[-1] == x[0]:
+        return (x, y)
+
+    bins = numpy.minimum(((x - x[0]) / (x[-1] - x[0]) * buckets).astype(numpy.int64), buckets - 1)
+    # sorted by bucket and then by value, so each bucket starts at its lowest
+    # point and ends at its highest
+    order = numpy.lexsort((y, bins))
+    sortedBins = bins[order]
+    starts = numpy.flatnonzero(numpy.r_[True, sortedBins[1:] != sortedBins[:-1]])
+    ends = numpy.r_[starts[1:], len(order)] - 1
+    keep = numpy.unique(numpy.concatenate((order[starts], order[ends])))
+    return (x[keep], y[keep])
+
+
+def foldLongTail(series, keep):
+    """Splits (name, x, y) series into the keep series with the largest total
+    y, in their original order, and everything else folded into one band.
+    The band is (x, lowest y, highest y, number folded) over the folded series,
+    or None when nothing had to be folded"""
+    if len(series) <= keep:
+        return (list(series), None)
+
+    totals = numpy.array([numpy.sum(y) for (name, x, y) in series], dtype=numpy.float64)
+    # stable, so ties go to the series that came first
+    largest = numpy.sort(numpy.argsort(-totals, kind='stable')[:keep])
+    shown = [series[i] for i in largest]
+
+    tail = numpy.ones(len(series), dtype=bool)
+    tail[largest] = False
+    folded = [series[i] for i in numpy.flatnonzero(tail)]
+    x = numpy.concatenate([numpy.asarray(fx, dtype=numpy.float64) for (name, fx, fy) in folded])
+    y = numpy.concatenate([numpy.asarray(fy, dtype=numpy.float64) for (name, fx, fy) in folded])
+    if len(x) == 0:
+        return (shown, None)
+
+    (bandX, inverse) = numpy.unique(x, return_inverse=True)
+    low = numpy.full(len(bandX), numpy.inf)
+    high = numpy.full(len(bandX), -numpy.inf)
+    numpy.minimum.at(low, inverse, y)
+    numpy.maximum.at(high, inverse, y)
+    return (shown, (bandX, low, high, len(folded)))
+
+
+def downsampleBand(x, low, high, buckets):
+    # like minMaxDownsample for a band, each bucket keeps its lowest low and
+    # highest high at the bucket's first x
+    if len(x) <= buckets or x[-1] == x[0]:
+        return (x, low, high)
+    bins = numpy.minimum(((x - x[0]) / (x[-1] - x[0]) * buckets).astype(numpy.int64), buckets - 1)
+    starts = numpy.flatnonzero(numpy.r_[True, bins[1:] != bins[:-1]])
+    return (x[starts], numpy.minimum.reduceat(low, starts), numpy.maximum.reduceat(high, starts))
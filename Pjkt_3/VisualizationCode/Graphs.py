@@ -0,0 +1,490 @@
+import collections
+import datetime
+
+import numpy
+
+import matplotlib
+import matplotlib.collections
+import matplotlib.dates
+import matplotlib.lines
+import matplotlib.ticker
+from matplotlib.figure import Figure
+
+import Downsampling
+import Metrics
+import Profiling
+
+
+def durationsInDays(seconds):
+    # durations in days, 0 for libraries with nothing to average
+    return numpy.where(numpy.isnan(seconds), 0, seconds / 86400)
+
+
+def selectedLibraries(domain, query=None):
+    # the libraries of the domain that the query covers
+    return domain.libraries if query is None else query.selectLibraries(domain)
+
+
+def libraryNames(domain, query=None):
+    return [library.name for library in selectedLibraries(domain, query)]
+
+
+def updateBars(bars, heights, bottoms=None):
+    # moves the rectangles of a BarContainer instead of making new ones
+    for i, rectangle in enumerate(bars):
+        rectangle.set_height(heights[i])
+        if bottoms is not None:
+            rectangle.set_y(bottoms[i])
+
+
+def updateLegendNames(axis, names):
+    legend = axis.get_legend()
+    if legend is not None:
+        for text, name in zip(legend.get_texts(), names):
+            text.set_text(name)
+
+
+class Graph():
+    """One graph on its own matplotlib Figure. Nothing in here knows about
+    Tk, so the same graphs are shown in the app's tabs and drawn to files by
+    BatchExport. Subclasses turn a domain into the data to plot in
+    computePlotData and draw that data in plotData, so the computed data can
+    be kept in the PlotCache and reused the next time the domain is shown"""
+
+    # the text of the graph's tab in the app
+    tabText = ''
+
+    def __init__(self, plotCache=None):
+        self.plotCache = plotCache
+
+        self.figure = Figure(figsize=(5, 5), dpi=100)
+        self.axis = self.figure.add_subplot(111)
+        self.figure.subplots_adjust(bottom=0.5)
+
+        # layoutOf the data last drawn from scratch, while its artists are
+        # still there to be updated
+        self.layout = None
+
+    def drawGraph(self, domain, query=None):
+        """Fills in the figure, whoever owns its canvas still has to draw it.
+        When the data has the same layout as what's on the figure the artists
+        already there are updated and True is returned, otherwise the graph is
+        drawn from scratch and it's False. A Query narrows the graph down to
+        part of the domain's data"""
+        with Profiling.phase(type(self).__name__):
+            data = self.getPlotData(domain, query)
+            layout = self.layoutOf(data)
+            if layout is not None and layout == self.layout:
+                with Profiling.phase('updatePlot'):
+                    self.updatePlot(data)
+                    self.rescale()
+                return True
+
+            with Profiling.phase('plotData'):
+                self.axis.clear()
+                self.plotData(data)
+            self.layout = layout
+            return False
+
+    def getPlotData(self, domain, query=None):
+        if self.plotCache is None:
+            return self.timedComputePlotData(domain, query)
+        # the domain's version changes whenever its data does, so stale data
+        # is never found
+        key = (domain.name, domain.version, self.plotKey(), None if query is None else query.key())
+        return self.plotCache.getOrCompute(key, lambda: self.timedComputePlotData(domain, query))
+
+    def plotKey(self):
+        # what tells this graph's data apart from other graphs' in the PlotCache
+        return type(self).__name__
+
+    def timedComputePlotData(self, domain, query=None):
+        with Profiling.phase('computePlotData'):
+            return self.computePlotData(domain, query)
+
+    def computePlotData(self, domain, query=None):
+        return {}
+
+    def plotData(self, data):
+        pass
+
+    def layoutOf(self, data):
+        # what has to match for updatePlot to work, None if it never can
+        return None
+
+    def updatePlot(self, data):
+        pass
+
+    def rescale(self):
+        # the limits follow the updated artists the way they would if the
+        # artists had just been added
+        for axis in self.figure.axes:
+            axis.relim()
+            axis.autoscale_view()
+
+    def rescaleWithToday(self):
+        # relim would put the Today line's date through a round trip of
+        # transforms, so it's left out and its exact date added back
+        self.todayLine.set_visible(False)
+        self.axis.relim(visible_only=True)
+        self.todayLine.set_visible(True)
+        self.axis.dataLim.update_from_data_x([self.today], ignore=False)
+        self.axis.autoscale_view()
+
+    def setNames(self, names):
+        self.axis.set_xticks(range(len(names)), labels=names)
+
+
+class PopularityGraph(Graph):
+
+    tabText = 'Compare Popularity'
+
+    def computePlotData(self, domain, query=None):
+        libraries = selectedLibraries(domain, query)
+        return {'x': numpy.arange(len(libraries)),
+                'heights': [int(library.popularity) for library in libraries],
+                'names': libraryNames(domain, query)}
+
+    def plotData(self, data):
+        self.bars = self.axis.bar(data['x'], data['heights'], tick_label=data['names'])
+        self.axis.tick_params(axis='x', labelrotation=45)
+
+        self.axis.set_title(label="The number of projects that use each library")
+        self.axis.set_ylabel('Number of projects')
+        self.axis.set_xlabel('Libraries')
+
+    def layoutOf(self, data):
+        return len(data['names'])
+
+    def updatePlot(self, data):
+        updateBars(self.bars, data['heights'])
+        self.setNames(data['names'])
+
+
+# the most libraries ReleaseFrequencyGraph draws a line for, one per color of
+# the default cycle
+MAX_SERIES = 10
+
+
+class ReleaseFrequencyGraph(Graph):
+
+    tabText = 'Release Frequency'
+
+    def computePlotData(self, domain, query=None):
+        series = []
+        for library, metrics in zip(selectedLibraries(domain, query), Metrics.domainMetrics(domain, query)):
+            years = [datetime.date(year, 1, 1) for (year, count) in metrics.releasesPerYear]
+            counts = [count for (year, count) in metrics.releasesPerYear]
+            series.append((library.name, matplotlib.dates.date2num(years), counts))
+        return {'series': series}
+
+    def plotData(self, data):
+        # however many libraries the domain has, only the busiest
+        # MAX_SERIES get a line of their own and the rest share a band
+        (shown, band) = Downsampling.foldLongTail(data['series'], MAX_SERIES)
+        width = max(int(self.axis.get_window_extent().width), 1)
+        colors = matplotlib.rcParams['axes.prop_cycle'].by_key()['color']
+
+        segments = []
+        handles = []
+        for i, (name, years, counts) in enumerate(shown):
+            (years, counts) = Downsampling.minMaxDownsample(years, counts, width)
+            segments.append(numpy.column_stack((years, counts)))
+            handles.append(matplotlib.lines.Line2D([], [], color=colors[i % len(colors)], marker='o', label=name))
+
+        # one collection for all the lines and one for all the markers
+        segmentColors = [colors[i % len(colors)] for i in range(len(segments))]
+        self.axis.add_collection(matplotlib.collections.LineCollection(segments, colors=segmentColors))
+        if segments:
+            points = numpy.concatenate(segments)
+            pointColors = numpy.repeat(segmentColors, [len(segment) for segment in segments])
+            self.axis.scatter(points[:, 0], points[:, 1], c=pointColors, s=36, zorder=2)
+
+        if band is not None:
+            (years, low, high, folded) = band
+            (years, low, high) = Downsampling.downsampleBand(years, low, high, width)
+            handles.append(self.axis.fill_between(years, low, high, color='grey', alpha=0.3,
+                                                  label=str(folded) + ' other libraries'))
+
+        self.axis.xaxis_date()
+        self.axis.autoscale_view()
+        self.axis.tick_params(axis='x', labelrotation=45)
+
+        self.axis.set_title(label='The number of releases per year for each library')
+        self.axis.set_ylabel('Number of releases')
+        self.axis.set_xlabel('Time')
+        self.axis.legend(handles=handles)
+
+
+class LastModifiedGraph(Graph):
+
+    tabText = 'Last Modified'
+
+    def computePlotData(self, domain, query=None):
+        return {'dates': [(library.name, matplotlib.dates.date2num(library.lastModificationDate))
+                          for library in selectedLibraries(domain, query)]}
+
+    def plotData(self, data):
+        self.lines = []
+        for (name, matdate) in data['dates']:
+            self.lines.extend(self.axis.plot_date(matdate, [1], label=name))
+            # self.axis.annotate(xy=(matdate, 1), s=library.name)
+            # self.axis.axvline(matplotlib.dates.date2num(library.lastModificationDate))
+
+        date = matplotlib.dates.date2num(datetime.date.today())
+        self.today = date
+        self.todayLine = self.axis.axvline(date,color='r')
+        self.axis.text(date,1,"Today", rotation=90)
+        # self.axis.legend(bbox_to_anchor=(0.7, -0.5))
+        self.axis.tick_params(axis='x', labelrotation=45)
+
+        self.axis.set_title('The last time each library was modified')
+        self.axis.set_xlabel("Time")
+        if self.lines:
+            self.axis.legend()
+        self.axis.set_yticks([])
+
+    def layoutOf(self, data):
+        return len(data['dates'])
+
+    def updatePlot(self, data):
+        for line, (name, matdate) in zip(self.lines, data['dates']):
+            line.set_data([matdate], [1])
+            line.set_label(name)
+        updateLegendNames(self.axis, [name for (name, matdate) in data['dates']])
+
+    def rescale(self):
+        self.rescaleWithToday()
+
+
+class IssueTypeGraph(Graph):
+
+    tabText = 'Issues Types'
+
+    def computePlotData(self, domain, query=None):
+        arrays = Metrics.metricArrays(domain, ('genericCount', 'securityCount', 'performanceCount'), query)
+        generic = arrays['genericCount']
+        security = arrays['securityCount']
+        performance = arrays['performanceCount']
+
+        total = generic + security + performance
+        # libraries without any issues get 0 for every type
+        share = 100 / numpy.where(total == 0, numpy.inf, total)
+        return {'x': numpy.arange(len(generic)),
+                'names': libraryNames(domain, query),
+                'genIssues': generic * share,
+                'secIssues': security * share,
+                'perIssues': performance * share}
+
+    def plotData(self, data):
+        x = data['x']
+        perIssues = data['perIssues']
+        secIssues = data['secIssues']
+        secPlusPerIssues = secIssues + perIssues
+
+        p1 = self.axis.bar(x, perIssues, tick_label=data['names'])
+        p2 = self.axis.bar(x, secIssues, bottom=perIssues)
+        p3 = self.axis.bar(x, data['genIssues'], bottom=secPlusPerIssues)
+        if len(x):
+            # a Query can leave no libraries, and then no bars to label
+            self.axis.legend((p1[0], p2[0], p3[0]), ('Performance', 'Security', 'Generic'))
+        self.bars = (p1, p2, p3)
+
+        self.axis.yaxis.set_major_formatter(matplotlib.ticker.PercentFormatter())
+        self.axis.tick_params(axis='x', labelrotation=45)
+
+        self.axis.set_title('Types of Issues per library')
+        self.axis.set_ylabel('Percent of the total issues')
+        self.axis.set_xlabel('Libraries')
+
+    def layoutOf(self, data):
+        return len(data['names'])
+
+    def updatePlot(self, data):
+        (p1, p2, p3) = self.bars
+        updateBars(p1, data['perIssues'])
+        updateBars(p2, data['secIssues'], data['perIssues'])
+        updateBars(p3, data['genIssues'], data['secIssues'] + data['perIssues'])
+        self.setNames(data['names'])
+
+
+# what a DurationGraph can show, and how its labels name it
+STATISTICS = collections.OrderedDict([('mean', 'Average'),
+                                      ('median', 'Median'),
+                                      ('p90', '90th percentile'),
+                                      ('p99', '99th percentile')])
+
+
+class DurationGraph(Graph):
+    """A graph of how long libraries take over their issues. It can show the
+    mean or a percentile of the durations, one of STATISTICS, and the means
+    of heavy tailed durations are mostly down to a few very slow issues"""
+
+    def __init__(self, plotCache=None, statistic='mean'):
+        Graph.__init__(self, plotCache)
+        self.statistic = statistic
+
+        self.twinAxis = self.axis.twinx()
+
+    def plotKey(self):
+        return type(self).__name__ + ' ' + self.statistic
+
+    def durations(self, domain, kind, countName, query=None):
+        # (the counts, the chosen statistic of the kind of duration in days)
+        arrays = Metrics.metricArrays(domain, (countName, self.statistic + kind + 'Seconds'), query)
+        return (arrays[countName], durationsInDays(arrays[self.statistic + kind + 'Seconds']))
+
+    def layoutOf(self, data):
+        return (len(data['names']), data['statistic'])
+
+
+class IssueResponseTimeGraph(DurationGraph):
+    """Draws a side by side bar graph showing the response time and the
+    number of unanswered issues per library"""
+
+    tabText = 'Issue Response time'
+
+    def computePlotData(self, domain, query=None):
+        (unanswered, responseTimes) = self.durations(domain, 'Response', 'unansweredCount', query)
+        return {'xTicks': numpy.arange(len(unanswered)),
+                'names': libraryNames(domain, query),
+                'numberUnanswered': unanswered,
+                'responseTime': responseTimes,
+                'statistic': self.statistic}
+
+    def plotData(self, data):
+        xTicks = data['xTicks']
+        statistic = STATISTICS[data['statistic']]
+
+        width = 0.4
+        self.axis.tick_params(axis='x', labelrotation=45)
+        self.twinAxis.clear()
+
+        p1 = self.axis.bar(xTicks, data['responseTime'], width=-width, align='edge', color='b', tick_label=data['names'])
+        self.axis.set_ylabel("Response Time (Days)")
+        p2 = self.twinAxis.bar(xTicks, data['numberUnanswered'], width=width, align='edge', color='r')
+        self.twinAxis.set_ylabel("Unanswered Issues")
+        self.twinAxis.legend((p1,p2), (statistic + ' Reponse Time', 'Number of Unanswered issues'))
+        self.axis.set_title(statistic + ' time to respond to issues and the number of issues that have no response')
+        self.axis.set_xlabel('Libraries')
+        self.bars = (p1, p2)
+
+    def updatePlot(self, data):
+        (p1, p2) = self.bars
+        updateBars(p1, data['responseTime'])
+        updateBars(p2, data['numberUnanswered'])
+        self.setNames(data['names'])
+
+
+class IssueClosingTimeGraph(DurationGraph):
+
+    tabText = 'Issue Closing time'
+
+    def computePlotData(self, domain, query=None):
+        (numberOpen, closingTimes) = self.durations(domain, 'Closing', 'openCount', query)
+        return {'xTicks': numpy.arange(len(numberOpen)),
+                'names': libraryNames(domain, query),
+                'numberOpen': numberOpen,
+                'closingTime': closingTimes,
+                'statistic': self.statistic}
+
+    def plotData(self, data):
+        xTicks = data['xTicks']
+        statistic = STATISTICS[data['statistic']]
+
+        self.twinAxis.clear()
+
+        width = 0.4
+        self.axis.tick_params(axis='x', labelrotation=45)
+
+        p1 = self.axis.bar(xTicks, data['closingTime'], width=-width, align='edge', color='b', tick_label=data['names'])
+        self.axis.set_ylabel("Closing Time (Days)")
+        p2 = self.twinAxis.bar(xTicks, data['numberOpen'], width=width, align='edge', color='r')
+        self.twinAxis.set_ylabel("Open Issues")
+        self.twinAxis.legend((p1, p2), (statistic + ' Closing Time', 'Number of Open issues'))
+        self.axis.set_title(statistic + ' time to close an issue and the number of open issues')
+        self.axis.set_xlabel('Libraries')
+        self.bars = (p1, p2)
+
+    def updatePlot(self, data):
+        (p1, p2) = self.bars
+        updateBars(p1, data['closingTime'])
+        updateBars(p2, data['numberOpen'])
+        self.setNames(data['names'])
+
+
+class BackwardsCompatibilityGraph(Graph):
+
+    tabText = 'Backwards Compatibility'
+
+    def computePlotData(self, domain, query=None):
+        libraries = selectedLibraries(domain, query)
+        return {'xTicks': numpy.arange(len(libraries)),
+                'names': libraryNames(domain, query),
+                'breakingChanges': Metrics.metricArray(domain, 'meanBreakingChanges', query)}
+
+    def plotData(self, data):
+        self.bars = self.axis.bar(data['xTicks'], data['breakingChanges'], tick_label=data['names'])
+        self.axis.set_ylabel('Average Breaking changes')
+        self.axis.set_title('The average number of breaking changes per release')
+        self.axis.set_xlabel('Libraries')
+
+    def layoutOf(self, data):
+        return len(data['names'])
+
+    def updatePlot(self, data):
+        updateBars(self.bars, data['breakingChanges'])
+        self.setNames(data['names'])
+
+
+class StackOverflowGraph(Graph):
+
+    tabText = 'Stack Overflow'
+
+    def computePlotData(self, domain, query=None):
+        return {'points': [(library.name, matplotlib.dates.date2num(library.lastDiscussedOnStackOverflow),
+                            int(library.questionsAsked))
+                           for library in selectedLibraries(domain, query)
+                           if library.lastDiscussedOnStackOverflow != 'Never']}
+
+    def plotData(self, data):
+        self.lines = []
+        for (name, date, questions) in data['points']:
+            self.lines.extend(self.axis.plot_date(date, [questions] ,label= name))
+
+        today = matplotlib.dates.date2num(datetime.date.today())
+        self.today = today
+        self.todayLine = self.axis.axvline(today, color='r')
+
+        (min, max) = self.axis.get_ylim()
+        mid = (max - min)/2  + min
+
+        self.todayText = self.axis.text(today, mid,  'Today', rotation= 90)
+        self.axis.tick_params(axis='x', labelrotation=45)
+        self.axis.set_title('The last time a library was disused on stack overflow and the number of questions asked about it')
+        self.axis.set_ylabel('The number of questions')
+        self.axis.set_xlabel('Time last discussed on stack overflow')
+        if self.lines:
+            self.axis.legend()
+
+    def layoutOf(self, data):
+        return len(data['points'])
+
+    def updatePlot(self, data):
+        for line, (name, date, questions) in zip(self.lines, data['points']):
+            line.set_data([date], [questions])
+            line.set_label(name)
+        updateLegendNames(self.axis, [name for (name, date, questions) in data['points']])
+
+    def rescale(self):
+        self.rescaleWithToday()
+        # the label sits half way up whatever the new limits are
+        (min, max) = self.axis.get_ylim()
+        self.todayText.set_y((max - min)/2  + min)
+
+
+# every graph, in the order of the app's tabs
+GRAPHS = [PopularityGraph, ReleaseFrequencyGraph, LastModifiedGraph, IssueTypeGraph, IssueResponseTimeGraph,
+          IssueClosingTimeGraph, BackwardsCompatibilityGraph, StackOverflowGraph]
+
+GRAPHS_BY_NAME = {graphClass.__name__: graphClass for graphClass in GRAPHS}
@@ -0,0 +1,70 @@
+import os
+
+import DataParser
+import IssueTable
+
+
+def ingestNewIssues(domains, dataDirectory=DataParser.TABLE_DATA_DIRECTORY, keepIssues=None,
+                    chunkSize=DataParser.ISSUE_CHUNK_SIZE):
+    """Applies the rows appended to the Issue Data file since it was last read
+    to an already loaded registry, and returns how many issues were added.
+
+    Each loaded domain remembers the byte offset it has read the file up to,
+    so only the new rows are parsed: their totals go into the libraries'
+    IssueStats, they're appended to the domains' IssueTables and Rollups, and Issue
+    objects are made for them when the libraries already keep their issues
+    (or keepIssues says to). Domains that haven't been loaded yet are left
+    alone, they'll read the whole file when they are. A file that got shorter
+    was rewritten rather than appended to and needs a full parseTables"""
+    fileName = DataParser.tablePath(DataParser.ISSUE_DATA, dataDirectory)
+    size = os.path.getsize(fileName)
+
+    # domains read up to the same offset are brought up to date together
+    groups = {}
+    for domain in domains:
+        if domain.loaded:
+            groups.setdefault(domain.issueDataOffset, []).append(domain)
+
+    added = 0
+    for offset, group in groups.items():
+        if size < offset:
+            raise ValueError(fileName + ' is shorter than when it was last read, reparse it with parseTables')
+        if size == offset:
+            continue
+        added += ingestRange(domains, group, fileName, offset, keepIssues, chunkSize)
+
+    return added
+
+
+def ingestRange(registry, domains, fileName, offset, keepIssues, chunkSize):
+    libraries = [library for domain in domains for library in domain.libraries]
+    libraryIds = {library.name: libraryId for libraryId, library in enumerate(libraries)}
+    if keepIssues is None:
+        keepIssues = any(library.issues for library in libraries)
+    builder = IssueTable.IssueTableBuilder()
+    added = 0
+
+    # a last line without its newline may still be being written, so it's
+    # left for the next call
+    lines = DataParser.FileLines(fileName, offset, completeOnly=True)
+    for (issueIds, chunk, unknown) in DataParser.readIssueChunks(lines, libraryIds, chunkSize):
+        # rows for libraries of the other groups aren't errors
+        DataParser.reportUnknownLibraries('issue data', [libraryName for libraryName in unknown
+                                                         if registry.getLibrary(libraryName) is None])
+        DataParser.addIssueTotals(libraries, chunk.libraryStats(len(libraries)), chunk.durationSketches(len(libraries)))
+        builder.addTable(chunk)
+        if keepIssues:
+            DataParser.addIssueObjects(libraries, issueIds, chunk)
+        added += len(chunk)
+
+    newTables = builder.build().splitByDomain(domains)
+    for domain in domains:
+        if domain.issueTable is not None:
+            domain.issueTable = IssueTable.concatenate([domain.issueTable, newTables[domain.name]])
+        if domain.rollups is not None:
+            domain.rollups.addIssues(newTables[domain.name])
+        domain.issueDataOffset = lines.position
+        if added:
+            domain.version += 1
+
+    return added
@@ -0,0 +1,174 @@
+import numpy
+
+import DataStructures
+import Sketches
+
+
+# the keys of IssueTable.libraryStats and the IssueStats attributes they match
+STAT_FIELDS = {'count': 'count', 'performance': 'performanceCount', 'security': 'securityCount',
+               'generic': 'genericCount', 'unanswered': 'unansweredCount', 'responseCount': 'responseCount',
+               'responseSeconds': 'responseSeconds', 'open': 'openCount', 'closingCount': 'closingCount',
+               'closingSeconds': 'closingSeconds'}
+
+
+class IssueTable():
+    """Column store of a domain's issues, one NumPy array per field.
+
+    libraryIds indexes into domain.libraries, the dates are datetime64[s]
+    with NaT where the csv said 'None', and performance/security are bools"""
+
+    def __init__(self, libraryIds, creationDates, closingDates, firstCommentDates, performance, security):
+        self.libraryIds = libraryIds
+        self.creationDates = creationDates
+        self.closingDates = closingDates
+        self.firstCommentDates = firstCommentDates
+        self.performance = performance
+        self.security = security
+        # see creationIndex
+        self.sortedByCreation = None
+
+    def __len__(self):
+        return len(self.libraryIds)
+
+    def __getstate__(self):
+        # the index is quick to rebuild, so snapshots don't carry it
+        state = self.__dict__.copy()
+        state['sortedByCreation'] = None
+        return state
+
+    def creationIndex(self):
+        """(rows, dates): the rows that have a creation date sorted by it, and
+        those dates in the same order, so a date range is two searchsorted
+        calls away. Built the first time it's asked for"""
+        if self.sortedByCreation is None:
+            known = numpy.flatnonzero(~numpy.isnat(self.creationDates))
+            order = known[numpy.argsort(self.creationDates[known], kind='stable')]
+            self.sortedByCreation = (order, self.creationDates[order])
+        return self.sortedByCreation
+
+    @staticmethod
+    def empty():
+        return IssueTable(numpy.empty(0, dtype=numpy.int32),
+                          numpy.empty(0, dtype='datetime64[s]'),
+                          numpy.empty(0, dtype='datetime64[s]'),
+                          numpy.empty(0, dtype='datetime64[s]'),
+                          numpy.empty(0, dtype=bool),
+                          numpy.empty(0, dtype=bool))
+
+    @staticmethod
+    def fromDomain(domain):
+        # builds the table out of the IssueLists kept on the libraries
+        builder = IssueTableBuilder()
+        for libraryId, library in enumerate(domain.libraries):
+            issues = library.issues
+            flags = numpy.frombuffer(issues.flags, dtype=numpy.uint8)
+            builder.addTable(IssueTable(numpy.full(len(issues), libraryId, dtype=numpy.int32),
+                                        numpy.frombuffer(issues.creationDates, dtype=numpy.int64).view('datetime64[s]'),
+                                        numpy.frombuffer(issues.closingDates, dtype=numpy.int64).view('datetime64[s]'),
+                                        numpy.frombuffer(issues.firstCommentDates, dtype=numpy.int64).view('datetime64[s]'),
+                                        (flags & DataStructures.PERFORMANCE) != 0,
+                                        (flags & DataStructures.SECURITY) != 0))
+        return builder.build()
+
+    def columns(self):
+        return (self.libraryIds, self.creationDates, self.closingDates, self.firstCommentDates,
+                self.performance, self.security)
+
+    def take(self, indices):
+        # a new table holding just the given rows
+        return IssueTable(*[column[indices] for column in self.columns()])
+
+    def splitByDomain(self, domains):
+        """Splits a table whose libraryIds count through every library of every
+        domain into one table per domain name, renumbering the ids to match
+        each domain.libraries"""
+        domainIds = []
+        localIds = []
+        for domainId, domain in enumerate(domains):
+            domainIds.extend([domainId] * len(domain.libraries))
+            localIds.extend(range(len(domain.libraries)))
+        domainIds = numpy.array(domainIds, dtype=numpy.int32)
+        localIds = numpy.array(localIds, dtype=numpy.int32)
+
+        rowDomains = domainIds[self.libraryIds]
+        order = numpy.argsort(rowDomains, kind='stable')
+        bounds = numpy.searchsorted(rowDomains[order], numpy.arange(len(domains) + 1))
+
+        tables = {}
+        for domainId, domain in enumerate(domains):
+            table = self.take(order[bounds[domainId]:bounds[domainId + 1]])
+            table.libraryIds = localIds[table.libraryIds]
+            tables[domain.name] = table
+        return tables
+
+    def libraryStats(self, numberOfLibraries):
+        """Reduces the table to per library arrays of counts and duration sums
+        (in seconds), using bincount as a vectorized group by"""
+        ids = self.libraryIds
+
+        def count(mask=None):
+            return numpy.bincount(ids if mask is None else ids[mask], minlength=numberOfLibraries)
+
+        def durationSum(end, mask):
+            seconds = (end[mask] - self.creationDates[mask]).astype(numpy.float64)
+            return numpy.bincount(ids[mask], weights=seconds, minlength=numberOfLibraries)
+
+        answered = ~numpy.isnat(self.firstCommentDates) & ~numpy.isnat(self.creationDates)
+        closed = ~numpy.isnat(self.closingDates) & ~numpy.isnat(self.creationDates)
+
+        return {
+            'count': count(),
+            'performance': count(self.performance),
+            'security': count(self.security),
+            'generic': count(~self.performance & ~self.security),
+            'unanswered': count(numpy.isnat(self.firstCommentDates)),
+            'responseCount': count(answered),
+            'responseSeconds': durationSum(self.firstCommentDates, answered),
+            'open': count(numpy.isnat(self.closingDates)),
+            'closingCount': count(closed),
+            'closingSeconds': durationSum(self.closingDates, closed),
+        }
+
+    def durationSketches(self, numberOfLibraries):
+        """{'response': counts, 'closing': counts}, each a numberOfLibraries x
+        Sketches.BINS array whose rows are the libraries' Sketch counts"""
+        sketches = {}
+        for (name, end) in (('response', self.firstCommentDates), ('closing', self.closingDates)):
+            known = ~numpy.isnat(end) & ~numpy.isnat(self.creationDates)
+            seconds = (end[known] - self.creationDates[known]).astype(numpy.float64)
+            sketches[name] = Sketches.groupedCounts(self.libraryIds[known], seconds, numberOfLibraries)
+        return sketches
+
+
+class IssueTableBuilder():
+    """Collects issues a chunk at a time and turns them into an IssueTable"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def addTable(self, table):
+        self.chunks.append(table.columns())
+
+    def build(self):
+        if not self.chunks:
+            return IssueTable.empty()
+        return IssueTable(*[numpy.concatenate(column) for column in zip(*self.chunks)])
+
+
+def concatenate(tables):
+    builder = IssueTableBuilder()
+    for table in tables:
+        builder.addTable(table)
+    return builder.build()
+
+
+def domainIssueStats(domain):
+    """Per library issue arrays for a domain. Uses the domain's IssueTable when
+    it has one and falls back on each library's running IssueStats"""
+    numberOfLibraries = len(domain.libraries)
+    if domain.issueTable is not None:
+        return domain.issueTable.libraryStats(numberOfLibraries)
+
+    return {key: numpy.array([getattr(library.issueStats, attribute) for library in domain.libraries],
+                             dtype=numpy.float64)
+            for key, attribute in STAT_FIELDS.items()}
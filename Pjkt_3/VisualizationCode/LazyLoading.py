@@ -0,0 +1,97 @@
+import DataParser
+import IssueTable
+import Profiling
+import Rollups
+
+
+class DomainLoader():
+    """Fills in a domain's libraries from the TableData files the first time
+    the domain is opened, reading only the rows for that domain's libraries"""
+
+    def __init__(self, dataDirectory=DataParser.TABLE_DATA_DIRECTORY, keepIssues=True, keepIssueTable=True):
+        self.dataDirectory = dataDirectory
+        self.keepIssues = keepIssues
+        self.keepIssueTable = keepIssueTable
+
+    def path(self, tableFile):
+        return DataParser.tablePath(tableFile, self.dataDirectory)
+
+    def loadDomain(self, domains, domain):
+        with Profiling.phase('loadDomain'):
+            self.readTables(domains, domain)
+
+    def readTables(self, domains, domain):
+        libraryNames = [library.name for library in domain.libraries]
+
+        def inDomain(values):
+            return [value for value in values if domain.containsLibraryWithName(value[0]) is not None]
+
+        with Profiling.phase(DataParser.POPULARITY):
+            DataParser.applyPopularity(domains, inDomain(DataParser.readPopularity(
+                self.path(DataParser.POPULARITY))))
+        with Profiling.phase(DataParser.RELEASE_FREQUENCY):
+            DataParser.applyReleaseFrequency(domains, DataParser.readReleaseFrequency(
+                self.path(DataParser.RELEASE_FREQUENCY), libraryNames))
+        with Profiling.phase(DataParser.LAST_MODIFICATION_DATE):
+            DataParser.applyLastModification(domains, inDomain(DataParser.readLastModification(
+                self.path(DataParser.LAST_MODIFICATION_DATE))))
+        with Profiling.phase(DataParser.BACKWARDS_COMPATIBILITY):
+            DataParser.applyBackwardsCompatibility(domains, DataParser.readBackwardsCompatibility(
+                self.path(DataParser.BACKWARDS_COMPATIBILITY), libraryNames))
+        with Profiling.phase(DataParser.STACK_OVERFLOW):
+            DataParser.applyStackOverflow(domains, inDomain(DataParser.readStackOverflow(
+                self.path(DataParser.STACK_OVERFLOW))))
+
+        libraryIds = {libraryName: libraryId for libraryId, libraryName in enumerate(libraryNames)}
+        with Profiling.phase(DataParser.ISSUE_DATA):
+            lines = DataParser.FileLines(self.path(DataParser.ISSUE_DATA))
+            self.addIssues(domain, DataParser.readIssueChunks(lines, libraryIds))
+        domain.issueDataOffset = lines.position
+
+    def addIssues(self, domain, issueChunks):
+        # the ids in the chunks are positions in domain.libraries, so together
+        # they make up this domain's IssueTable
+        numberOfLibraries = len(domain.libraries)
+        builder = IssueTable.IssueTableBuilder()
+        rollupBuilder = Rollups.RollupBuilder()
+        for (issueIds, chunk, unknown) in issueChunks:
+            with Profiling.phase('build model'):
+                DataParser.addIssueTotals(domain.libraries, chunk.libraryStats(numberOfLibraries),
+                                          chunk.durationSketches(numberOfLibraries))
+                rollupBuilder.addIssues(chunk)
+                if self.keepIssueTable:
+                    builder.addTable(chunk)
+                if self.keepIssues:
+                    DataParser.addIssueObjects(domain.libraries, issueIds, chunk)
+
+        if self.keepIssueTable:
+            domain.issueTable = builder.build()
+        with Profiling.phase('rollups'):
+            domain.rollups = Rollups.DomainRollups.fromDomain(domain, rollupBuilder.build())
+
+    def loadAll(self, domains):
+        """Loads every domain of a registry fresh from loadLibraryInfo,
+        yielding each one once it's done. Opening them one by one would read
+        every table once per domain, here each is read once and Issue Data is
+        streamed through in chunks like DataParser.parseTables does"""
+        with Profiling.phase('loadAll'):
+            DataParser.applyLibraryTables(domains, self.dataDirectory)
+            with Profiling.phase(DataParser.ISSUE_DATA):
+                DataParser.ingestIssues(domains, self.path(DataParser.ISSUE_DATA), self.keepIssues,
+                                        self.keepIssueTable)
+
+        for domain in domains:
+            domain.loaded = True
+            domain.version += 1
+            yield domain
+
+
+def loadLibraryInfo(keepIssues=True, keepIssueTable=True, dataDirectory=DataParser.TABLE_DATA_DIRECTORY):
+    """Reads only Library Info. Every domain starts out unloaded and gets its
+    data when it's passed to domains.ensureLoaded, after which it's kept"""
+    with Profiling.phase(DataParser.LIBRARY_INFO):
+        domains = DataParser.readLibraryInfo(DataParser.tablePath(DataParser.LIBRARY_INFO, dataDirectory))
+    domains.loader = DomainLoader(dataDirectory, keepIssues, keepIssueTable)
+    for domain in domains:
+        domain.loaded = False
+    return domains
@@ -0,0 +1,183 @@
+import collections
+
+import numpy
+
+import IssueTable
+import Profiling
+import Sketches
+
+
+class LibraryMetrics():
+    """The per library numbers the graphs are drawn from. Durations are in
+    seconds, and the means and percentiles are None when there's nothing to
+    average. The medians, p90s and p99s come from the libraries' Sketches, so
+    they're within Sketches.RELATIVE_ERROR of the exact ones. Percentiles of
+    part of the data need its issues, so they're None for a window of a
+    domain whose issues weren't kept"""
+
+    __slots__ = ('releasesPerYear', 'performanceCount', 'securityCount', 'genericCount', 'issueCount',
+                 'unansweredCount', 'responseSeconds', 'responseCount', 'meanResponseSeconds',
+                 'medianResponseSeconds', 'p90ResponseSeconds', 'p99ResponseSeconds', 'openCount',
+                 'closingSeconds', 'closingCount', 'meanClosingSeconds', 'medianClosingSeconds',
+                 'p90ClosingSeconds', 'p99ClosingSeconds', 'meanBreakingChanges')
+
+    def __init__(self):
+        # (year, number of releases) in year order
+        self.releasesPerYear = []
+        self.performanceCount = 0
+        self.securityCount = 0
+        self.genericCount = 0
+        self.issueCount = 0
+
+        self.unansweredCount = 0
+        self.responseSeconds = 0
+        self.responseCount = 0
+        self.meanResponseSeconds = None
+        self.medianResponseSeconds = None
+        self.p90ResponseSeconds = None
+        self.p99ResponseSeconds = None
+
+        self.openCount = 0
+        self.closingSeconds = 0
+        self.closingCount = 0
+        self.meanClosingSeconds = None
+        self.medianClosingSeconds = None
+        self.p90ClosingSeconds = None
+        self.p99ClosingSeconds = None
+
+        self.meanBreakingChanges = 0
+
+
+def releasesPerYear(library, query=None):
+    dates = library.releaseDates if query is None else query.releaseDates(library)
+    counts = collections.Counter(date.year for date in dates)
+    return sorted(counts.items())
+
+
+def meanBreakingChanges(library):
+    changes = library.breakingChangesPerRelease
+    if not changes:
+        return 0
+    return sum(count for (release, count) in changes) / len(changes)
+
+
+def issueTableOf(domain):
+    # the domain's IssueTable, or one made from the issues kept on its libraries
+    if domain.issueTable is not None:
+        return domain.issueTable
+    if any(len(library.issues) for library in domain.libraries):
+        return IssueTable.IssueTable.fromDomain(domain)
+    return None
+
+
+def librarySketches(domain):
+    # the sketches filled in while the libraries' issues were read
+    return {'response': [library.issueStats.responseSketch for library in domain.libraries],
+            'closing': [library.issueStats.closingSketch for library in domain.libraries]}
+
+
+def tableSketches(table, numberOfLibraries):
+    counts = table.durationSketches(numberOfLibraries)
+    return {name: [Sketches.Sketch(row) for row in counts[name]] for name in counts}
+
+
+def computeDomainMetrics(domain, query=None):
+    numberOfLibraries = len(domain.libraries)
+    rollups = domain.rollups if domain.rollups is not None and domain.rollups.answers(query) else None
+
+    sketches = None
+    if query is not None and query.filtersIssues():
+        # percentiles of part of the data need that part's durations, which
+        # only a table or kept issues have
+        table = issueTableOf(domain)
+        if table is not None:
+            table = query.filterIssues(table)
+            sketches = tableSketches(table, numberOfLibraries)
+        if rollups is not None:
+            # a handful of buckets instead of every issue in the window
+            stats = rollups.issueStats(query)
+        elif table is None:
+            raise ValueError('the issues of ' + domain.name + ' were not kept, so they can not be filtered')
+        else:
+            stats = table.libraryStats(numberOfLibraries)
+    else:
+        stats = IssueTable.domainIssueStats(domain)
+        sketches = librarySketches(domain)
+
+    if rollups is not None:
+        releases = rollups.releasesPerYear(query)
+    else:
+        releases = [releasesPerYear(library, query) for library in domain.libraries]
+
+    allMetrics = []
+    for libraryId, library in enumerate(domain.libraries):
+        metrics = LibraryMetrics()
+        metrics.releasesPerYear = releases[libraryId]
+        metrics.meanBreakingChanges = meanBreakingChanges(library)
+
+        metrics.issueCount = int(stats['count'][libraryId])
+        metrics.performanceCount = int(stats['performance'][libraryId])
+        metrics.securityCount = int(stats['security'][libraryId])
+        metrics.genericCount = int(stats['generic'][libraryId])
+
+        metrics.unansweredCount = int(stats['unanswered'][libraryId])
+        metrics.responseSeconds = float(stats['responseSeconds'][libraryId])
+        metrics.responseCount = int(stats['responseCount'][libraryId])
+        if metrics.responseCount:
+            metrics.meanResponseSeconds = metrics.responseSeconds / metrics.responseCount
+
+        metrics.openCount = int(stats['open'][libraryId])
+        metrics.closingSeconds = float(stats['closingSeconds'][libraryId])
+        metrics.closingCount = int(stats['closingCount'][libraryId])
+        if metrics.closingCount:
+            metrics.meanClosingSeconds = metrics.closingSeconds / metrics.closingCount
+
+        if sketches is not None:
+            response = sketches['response'][libraryId]
+            metrics.medianResponseSeconds = response.percentile(50)
+            metrics.p90ResponseSeconds = response.percentile(90)
+            metrics.p99ResponseSeconds = response.percentile(99)
+            closing = sketches['closing'][libraryId]
+            metrics.medianClosingSeconds = closing.percentile(50)
+            metrics.p90ClosingSeconds = closing.percentile(90)
+            metrics.p99ClosingSeconds = closing.percentile(99)
+
+        allMetrics.append(metrics)
+    return allMetrics
+
+
+def domainMetrics(domain, query=None):
+    """LibraryMetrics for every library in the domain that the query covers,
+    in domain.libraries order. Without a time window or issue types they're
+    worked out once and kept on each library with the library's version, so
+    they're only recomputed after its data changes. Metrics for part of the
+    data are worked out every time, the PlotCache keeps what's drawn from them"""
+    if query is not None and query.filtersIssues():
+        with Profiling.phase('computeDomainMetrics'):
+            allMetrics = computeDomainMetrics(domain, query)
+    elif all(library.metrics is not None and library.metrics[0] == library.version
+             for library in domain.libraries):
+        allMetrics = [library.metrics[1] for library in domain.libraries]
+    else:
+        # a domain's issue statistics come from one pass over its table, so a
+        # stale library means the whole domain is redone
+        with Profiling.phase('computeDomainMetrics'):
+            allMetrics = computeDomainMetrics(domain)
+        for library, metrics in zip(domain.libraries, allMetrics):
+            library.metrics = (library.version, metrics)
+
+    if query is None or query.libraries is None:
+        return allMetrics
+    return [allMetrics[libraryId] for libraryId in query.libraryIds(domain)]
+
+
+def metricArray(domain, name, query=None):
+    # one LibraryMetrics attribute for each library the query covers
+    return numpy.array([getattr(metrics, name) for metrics in domainMetrics(domain, query)], dtype=numpy.float64)
+
+
+def metricArrays(domain, names, query=None):
+    # several attributes at once, from a single domainMetrics call
+    allMetrics = domainMetrics(domain, query)
+    return {name: numpy.array([getattr(metrics, name) for metrics in allMetrics], dtype=numpy.float64)
+            for name in names}
@@ -0,0 +1,111 @@
+import concurrent.futures
+import os
+
+import DataParser
+import IssueTable
+import Rollups
+
+
+def parseIssueRange(fileName, libraryNames, start, end, keepIssues, keepIssueTable, chunkSize):
+    """Runs in a worker process. Parses the issue rows in the byte range
+    [start, end) and sends back the per library totals, duration sketches and
+    rollups, plus the rows as an IssueTable and their ids when the caller
+    wants to keep them"""
+    libraryIds = {libraryName: libraryId for libraryId, libraryName in enumerate(libraryNames)}
+    builder = IssueTable.IssueTableBuilder()
+    rollupBuilder = Rollups.RollupBuilder()
+    totals = None
+    sketches = None
+    issueIds = []
+    unknown = []
+
+    lines = DataParser.FileLines(fileName, start, end)
+    for (chunkIssueIds, chunk, chunkUnknown) in DataParser.readIssueChunks(lines, libraryIds, chunkSize):
+        stats = chunk.libraryStats(len(libraryNames))
+        chunkSketches = chunk.durationSketches(len(libraryNames))
+        if totals is None:
+            (totals, sketches) = (stats, chunkSketches)
+        else:
+            for key in totals:
+                totals[key] = totals[key] + stats[key]
+            # sketches merge by adding their counts
+            for key in sketches:
+                sketches[key] = sketches[key] + chunkSketches[key]
+        unknown.extend(chunkUnknown)
+        rollupBuilder.addIssues(chunk)
+
+        if keepIssueTable or keepIssues:
+            builder.addTable(chunk)
+        if keepIssues:
+            issueIds.extend(chunkIssueIds)
+
+    table = builder.build() if keepIssueTable or keepIssues else None
+    return (totals, sketches, table, issueIds, unknown, rollupBuilder.build(), lines.position)
+
+
+def issueRanges(fileName, count):
+    # splits the file into count byte ranges of about the same size
+    size = os.path.getsize(fileName)
+    bounds = [size * i // count for i in range(count + 1)]
+    return [(bounds[i], bounds[i + 1]) for i in range(count) if bounds[i] < bounds[i + 1]]
+
+
+def parseTablesInParallel(keepIssues=True, keepIssueTable=True, dataDirectory=DataParser.TABLE_DATA_DIRECTORY,
+                          workers=None, chunkSize=DataParser.ISSUE_CHUNK_SIZE):
+    """Same result as DataParser.parseTables, but once Library Info is read the
+    other tables are parsed in a pool of worker processes, with the Issue Data
+    file split into one byte range per worker. The results are applied in the
+    same order parseTables uses, so the domains come out identical"""
+    workers = workers or os.cpu_count() or 1
+
+    def path(tableFile):
+        return DataParser.tablePath(tableFile, dataDirectory)
+
+    domains = DataParser.readLibraryInfo(path(DataParser.LIBRARY_INFO))
+    libraryNames = DataParser.libraryNamesOf(domains)
+    libraries = [domains.getLibrary(libraryName) for libraryName in libraryNames]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        popularity = pool.submit(DataParser.readPopularity, path(DataParser.POPULARITY))
+        releases = pool.submit(DataParser.readReleaseFrequency, path(DataParser.RELEASE_FREQUENCY), libraryNames)
+        lastModification = pool.submit(DataParser.readLastModification, path(DataParser.LAST_MODIFICATION_DATE))
+        breakingChanges = pool.submit(DataParser.readBackwardsCompatibility,
+                                      path(DataParser.BACKWARDS_COMPATIBILITY), libraryNames)
+        stackOverflow = pool.submit(DataParser.readStackOverflow, path(DataParser.STACK_OVERFLOW))
+
+        issueFile = path(DataParser.ISSUE_DATA)
+        issueParts = [pool.submit(parseIssueRange, issueFile, libraryNames, start, end, keepIssues, keepIssueTable,
+                                  chunkSize)
+                      for (start, end) in issueRanges(issueFile, workers)]
+
+        DataParser.applyPopularity(domains, popularity.result())
+        DataParser.applyReleaseFrequency(domains, releases.result())
+        DataParser.applyLastModification(domains, lastModification.result())
+        DataParser.applyBackwardsCompatibility(domains, breakingChanges.result())
+        DataParser.applyStackOverflow(domains, stackOverflow.result())
+
+        builder = IssueTable.IssueTableBuilder()
+        rollupParts = []
+        issueDataOffset = 0
+        for part in issueParts:
+            (totals, sketches, table, issueIds, unknown, rollups, issueDataOffset) = part.result()
+            rollupParts.append(rollups)
+            DataParser.reportUnknownLibraries('issue data', unknown)
+            if totals is not None:
+                DataParser.addIssueTotals(libraries, totals, sketches)
+            if keepIssues:
+                DataParser.addIssueObjects(libraries, issueIds, table)
+            if keepIssueTable:
+                builder.addTable(table)
+
+    if keepIssueTable:
+        DataParser.setIssueTables(domains, builder.build())
+    # rollups add up, so each range's are simply merged
+    DataParser.setRollups(domains, {unit: Rollups.Rollup.concatenate([rollups[unit] for rollups in rollupParts], unit)
+                                    for unit in Rollups.UNITS})
+
+    # the last range ends where the rows appended later begin
+    for domain in domains:
+        domain.issueDataOffset = issueDataOffset
+
+    return domains
@@ -0,0 +1,82 @@
+import collections
+import os
+import sys
+
+import numpy
+
+
+# how much computed plot data is kept around, VIS_PLOT_CACHE_MB overrides it
+DEFAULT_BUDGET_BYTES = int(float(os.environ.get('VIS_PLOT_CACHE_MB', 64)) * 1024 * 1024)
+
+
+def estimateSize(value):
+    """A rough count of the bytes held by a value made of numpy arrays,
+    dicts, lists, tuples and scalars"""
+    if isinstance(value, numpy.ndarray):
+        return value.nbytes + sys.getsizeof(value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimateSize(key) + estimateSize(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimateSize(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class PlotCache():
+    """Least recently used cache of computed plot data, keyed by
+    (domain, version, graph). Once the data held goes over budgetBytes the
+    entries used longest ago are dropped"""
+
+    def __init__(self, budgetBytes=DEFAULT_BUDGET_BYTES):
+        self.budgetBytes = budgetBytes
+        self.entries = collections.OrderedDict()
+        self.totalBytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def get(self, key, default=None):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key, value, size=None):
+        if size is None:
+            size = estimateSize(value)
+        self.discard(key)
+        # something bigger than the whole budget isn't worth keeping
+        if size > self.budgetBytes:
+            return
+        self.entries[key] = (value, size)
+        self.totalBytes += size
+        while self.totalBytes > self.budgetBytes:
+            (oldKey, (oldValue, oldSize)) = self.entries.popitem(last=False)
+            self.totalBytes -= oldSize
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.totalBytes -= entry[1]
+
+    def getOrCompute(self, key, compute):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry[0]
+        self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.totalBytes = 0
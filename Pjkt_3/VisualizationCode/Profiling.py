@@ -0,0 +1,177 @@
+# Timing for the parse and draw pipeline. Off unless VIS_PROFILE is set (or
+# enable() is called, BatchExport and Benchmark have a --profile flag):
+#
+#   VIS_PROFILE=1 python Visualizations.py
+#       prints the wall time and calls of every phase on exit
+#   VIS_PROFILE=1 VIS_PROFILE_MEMORY=1 python Visualizations.py
+#       also the memory each phase allocated. tracemalloc slows allocation
+#       heavy code down several times over, so take the times from a run
+#       without it
+#   VIS_PROFILE=1 VIS_PROFILE_TRACE=run.prof python Visualizations.py
+#       also writes a cProfile dump to run.prof (snakeviz, flameprof, pstats)
+#       and the phases as folded stacks to run.prof.folded (flamegraph.pl)
+#
+# Only the process profiling is switched on in is measured, not the workers of
+# a process pool.
+
+import atexit
+import collections
+import contextlib
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+
+ENABLED_VARIABLE = 'VIS_PROFILE'
+TRACE_VARIABLE = 'VIS_PROFILE_TRACE'
+MEMORY_VARIABLE = 'VIS_PROFILE_MEMORY'
+
+# the profiler once enable() is called, phase() does nothing while it's None
+profiler = None
+
+
+class PhaseStats():
+
+    __slots__ = ('calls', 'seconds', 'allocatedBytes')
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.allocatedBytes = 0
+
+
+class Profiler():
+    """Adds up the time and calls of every phase, and the memory it
+    allocated when traceMemory is set. Phases nest, and each one is kept
+    under the path of phases it ran inside of, per thread, so the loader
+    thread and the Tk thread don't get mixed up"""
+
+    def __init__(self, traceFile=None, traceMemory=False):
+        self.stats = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.traceMemory = traceMemory
+        self.traceFile = traceFile
+        # one cProfile.Profile per thread that was profiled
+        self.profiles = []
+
+        if traceMemory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stack(self):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        stack = self.stack()
+        stack.append(name)
+        allocated = tracemalloc.get_traced_memory()[0] if self.traceMemory else 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if self.traceMemory:
+                allocated = tracemalloc.get_traced_memory()[0] - allocated
+            path = tuple(stack)
+            stack.pop()
+
+            with self.lock:
+                phaseStats = self.stats.get(path)
+                if phaseStats is None:
+                    phaseStats = self.stats[path] = PhaseStats()
+                phaseStats.calls += 1
+                phaseStats.seconds += seconds
+                phaseStats.allocatedBytes += allocated
+
+    def startProfile(self):
+        # cProfile only sees the thread it's enabled on
+        if self.traceFile is None:
+            return None
+        profile = cProfile.Profile()
+        with self.lock:
+            self.profiles.append(profile)
+        profile.enable()
+        return profile
+
+    def summary(self):
+        header = '%-60s %8s %10s %10s' % ('phase', 'calls', 'total s', 'mean ms')
+        lines = [header + (' %12s' % 'allocated MB' if self.traceMemory else '')]
+        for path, phaseStats in sorted(self.stats.items()):
+            line = '%-60s %8d %10.3f %10.3f' % ('  ' * (len(path) - 1) + path[-1], phaseStats.calls,
+                                                phaseStats.seconds, phaseStats.seconds * 1000 / phaseStats.calls)
+            if self.traceMemory:
+                line += ' %12.2f' % (phaseStats.allocatedBytes / (1024 * 1024))
+            lines.append(line)
+        return '\n'.join(lines)
+
+    def folded(self):
+        """The phases as 'outer;inner microseconds' lines, the folded stack
+        format flamegraph.pl reads. Each line holds the time spent in the phase
+        itself, outside the phases inside it"""
+        selfSeconds = {path: phaseStats.seconds for path, phaseStats in self.stats.items()}
+        for path, phaseStats in self.stats.items():
+            if path[:-1] in selfSeconds:
+                selfSeconds[path[:-1]] -= phaseStats.seconds
+        return '\n'.join(';'.join(path) + ' ' + str(max(int(seconds * 1000000), 0))
+                         for path, seconds in sorted(selfSeconds.items()))
+
+    def writeTrace(self):
+        for profile in self.profiles:
+            profile.disable()
+        if self.profiles:
+            stats = pstats.Stats(self.profiles[0])
+            for profile in self.profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(self.traceFile)
+        with open(self.traceFile + '.folded', 'w') as foldedFile:
+            foldedFile.write(self.folded() + '\n')
+
+    def report(self, output=None):
+        output = output or sys.stderr
+        output.write(self.summary() + '\n')
+        if self.traceFile is not None:
+            self.writeTrace()
+            output.write('profile written to ' + self.traceFile + ' and ' + self.traceFile + '.folded\n')
+
+
+def enable(traceFile=None, traceMemory=False):
+    """Starts recording phases, and cProfile too when given a traceFile, and
+    tracemalloc with traceMemory set. The summary is printed, and the trace
+    written, when the program exits"""
+    global profiler
+    if profiler is None:
+        profiler = Profiler(traceFile, traceMemory)
+        profiler.startProfile()
+        atexit.register(profiler.report)
+    return profiler
+
+
+def phase(name):
+    # 'with Profiling.phase(name):' around anything worth timing
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.phase(name)
+
+
+def profileThread(function):
+    """Wraps the target of a thread so cProfile follows it into the thread"""
+    def run(*arguments, **keywords):
+        profile = profiler.startProfile() if profiler is not None else None
+        try:
+            return function(*arguments, **keywords)
+        finally:
+            if profile is not None:
+                profile.disable()
+    return run
+
+
+if os.environ.get(ENABLED_VARIABLE):
+    enable(os.environ.get(TRACE_VARIABLE) or None, bool(os.environ.get(MEMORY_VARIABLE)))
@@ -0,0 +1,127 @@
+import datetime
+
+import numpy
+
+
+# the issue types a Query can be narrowed to. An issue that's neither a
+# performance nor a security issue is generic
+ISSUE_TYPES = ('performance', 'security', 'generic')
+
+
+def asDateTime(value):
+    # dates mean the start of that day
+    if value is None or isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime(value.year, value.month, value.day)
+
+
+def firstDayFrom(moment):
+    # the first whole day starting at or after moment
+    if moment is None:
+        return None
+    if moment.time() == datetime.time():
+        return moment.date()
+    return moment.date() + datetime.timedelta(days=1)
+
+
+def monthsBefore(date, months):
+    # the same day of the month, months earlier, clamped to the month's end
+    month = date.month - 1 - months
+    year = date.year + month // 12
+    month = month % 12 + 1
+    for day in range(date.day, 0, -1):
+        try:
+            return date.replace(year=year, month=month, day=day)
+        except ValueError:
+            continue
+
+
+class Query():
+    """Which part of the data the graphs should cover. Every part left as None
+    covers everything: issues created and releases made from start up to but
+    not including end, issues of the given types, and the named libraries.
+    Which domains get drawn is up to the caller. A Query can't be changed
+    once it's made, so it can be part of a PlotCache key"""
+
+    def __init__(self, start=None, end=None, issueTypes=None, libraries=None):
+        self.start = asDateTime(start)
+        self.end = asDateTime(end)
+        self.issueTypes = None if issueTypes is None else frozenset(issueTypes)
+        self.libraries = None if libraries is None else frozenset(libraries)
+
+        if self.issueTypes is not None:
+            unknown = self.issueTypes.difference(ISSUE_TYPES)
+            if unknown:
+                raise ValueError('unknown issue types: ' + ', '.join(sorted(unknown)))
+        if self.start is not None and self.end is not None and self.end < self.start:
+            raise ValueError('the query ends before it starts')
+
+    @staticmethod
+    def lastMonths(months, end=None, **keywords):
+        """The months before end, today included when end is left out"""
+        if end is None:
+            end = datetime.date.today() + datetime.timedelta(days=1)
+        return Query(start=monthsBefore(end, months), end=end, **keywords)
+
+    def key(self):
+        def sortedOrNone(values):
+            return None if values is None else tuple(sorted(values))
+        return (self.start, self.end, sortedOrNone(self.issueTypes), sortedOrNone(self.libraries))
+
+    def __eq__(self, other):
+        return isinstance(other, Query) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return 'Query' + repr(self.key())
+
+    def hasTimeWindow(self):
+        return self.start is not None or self.end is not None
+
+    def filtersIssues(self):
+        return self.hasTimeWindow() or self.issueTypes is not None
+
+    def libraryIds(self, domain):
+        # positions in domain.libraries of the libraries the query covers
+        if self.libraries is None:
+            return list(range(len(domain.libraries)))
+        return [libraryId for libraryId, library in enumerate(domain.libraries) if library.name in self.libraries]
+
+    def selectLibraries(self, domain):
+        return [domain.libraries[libraryId] for libraryId in self.libraryIds(domain)]
+
+    def releaseDates(self, library):
+        # a release counts as made at the very start of its day
+        return library.releaseDatesBetween(firstDayFrom(self.start), firstDayFrom(self.end))
+
+    def issueRows(self, table):
+        """Row numbers of the table's issues that match the query. The time
+        window is found by bisecting the table's creation date index, so only
+        the issues inside it are ever looked at"""
+        if self.hasTimeWindow():
+            (order, dates) = table.creationIndex()
+            low = 0 if self.start is None else numpy.searchsorted(dates, numpy.datetime64(self.start, 's'), 'left')
+            high = len(dates) if self.end is None else numpy.searchsorted(dates, numpy.datetime64(self.end, 's'), 'left')
+            rows = numpy.sort(order[low:high])
+        else:
+            rows = numpy.arange(len(table))
+
+        if self.issueTypes is not None:
+            performance = table.performance[rows]
+            security = table.security[rows]
+            keep = numpy.zeros(len(rows), dtype=bool)
+            if 'performance' in self.issueTypes:
+                keep |= performance
+            if 'security' in self.issueTypes:
+                keep |= security
+            if 'generic' in self.issueTypes:
+                keep |= ~performance & ~security
+            rows = rows[keep]
+        return rows
+
+    def filterIssues(self, table):
+        if not self.filtersIssues():
+            return table
+        return table.take(self.issueRows(table))
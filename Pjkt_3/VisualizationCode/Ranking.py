@@ -0,0 +1,224 @@
+# Ranks the libraries of every domain against each other on a weighted score:
+#
+#   python Ranking.py --top 10
+#   python Ranking.py --domain testing --weight popularity=2 responseTime=0
+
+import argparse
+import collections
+import math
+
+import numpy
+
+import DataParser
+import DateParsing
+import Metrics
+import Profiling
+
+
+# what libraries are ranked on, and whether more of it is better
+RANKING_METRICS = collections.OrderedDict([('popularity', True),
+                                           ('releaseFrequency', True),
+                                           ('lastModified', True),
+                                           ('breakingChanges', False),
+                                           ('responseTime', False),
+                                           ('stackOverflow', True)])
+
+DEFAULT_WEIGHTS = collections.OrderedDict((name, 1.0) for name in RANKING_METRICS)
+
+
+def releaseFrequency(releasesPerYear):
+    # releases a year from the first year with a release to the last one
+    if not releasesPerYear:
+        return math.nan
+    years = releasesPerYear[-1][0] - releasesPerYear[0][0] + 1
+    return sum(count for (year, count) in releasesPerYear) / years
+
+
+def libraryValues(library, metrics):
+    """The library's value for each of RANKING_METRICS, in order, NaN for the
+    ones it has no data for. Everything comes from the memoized
+    LibraryMetrics and the library's own fields, no issue is looked at"""
+    lastModified = math.nan
+    if library.lastModificationDate is not None:
+        lastModified = DateParsing.toEpochDay(library.lastModificationDate)
+    responseTime = metrics.medianResponseSeconds
+    return [float(library.popularity),
+            releaseFrequency(metrics.releasesPerYear),
+            lastModified,
+            metrics.meanBreakingChanges,
+            math.nan if responseTime is None else responseTime,
+            float(library.questionsAsked)]
+
+
+def normalize(values, higherIsBetter):
+    """Scores from 0 to 1, 1 being the best, out of where each value ranks
+    among the others. Ranks don't let one huge value squash everything else
+    the way scaling by the largest would. Ties share their average rank and
+    missing values score 0"""
+    scores = numpy.zeros(len(values))
+    known = ~numpy.isnan(values)
+    if not known.any():
+        return scores
+    ordered = numpy.sort(values[known])
+    low = numpy.searchsorted(ordered, values[known], 'left')
+    high = numpy.searchsorted(ordered, values[known], 'right')
+    ranks = (low + high - 1) / 2.0
+    scores[known] = ranks / (len(ordered) - 1) if len(ordered) > 1 else 1.0
+    if not higherIsBetter:
+        scores[known] = 1.0 - scores[known]
+    return scores
+
+
+def rankOrders(scores, rowDomains):
+    """(order, domainOrder): the rows from the best score down, and the same
+    with the rows of each domain kept together, so a domain's best rows are
+    the start of its block"""
+    order = numpy.argsort(-scores, kind='stable')
+    domainOrder = order[numpy.argsort(rowDomains[order], kind='stable')]
+    return (order, domainOrder)
+
+
+class RankingIndex():
+    """Every library of every domain, one row each, with its normalized
+    score for each of RANKING_METRICS.
+
+    The rows of a domain are next to each other, domainRows gives where they
+    start and end. For each metric, and for the DEFAULT_WEIGHTS composite,
+    orders keeps the rows sorted best first overall and within each domain,
+    so a top k by one of them is a slice. Other weights take one matrix
+    product over the rows, never a pass over the issues"""
+
+    def __init__(self, domainNames, libraryNames, rowDomains, values):
+        self.domainNames = domainNames
+        self.libraryNames = libraryNames
+        self.rowDomains = rowDomains
+        self.values = values
+
+        bounds = numpy.searchsorted(rowDomains, numpy.arange(len(domainNames) + 1))
+        self.domainRows = {name: (bounds[domainId], bounds[domainId + 1])
+                           for domainId, name in enumerate(domainNames)}
+
+        self.scores = numpy.column_stack([normalize(values[:, column], higherIsBetter)
+                                          for column, higherIsBetter in enumerate(RANKING_METRICS.values())])
+
+        # keyed by metric name, or None for the DEFAULT_WEIGHTS composite
+        self.orders = {name: rankOrders(self.scores[:, column], rowDomains)
+                       for column, name in enumerate(RANKING_METRICS)}
+        self.orders[None] = rankOrders(self.composite(self.weightVector(DEFAULT_WEIGHTS)), rowDomains)
+
+    def __len__(self):
+        return len(self.libraryNames)
+
+    @staticmethod
+    def fromDomains(domains):
+        domainNames = []
+        libraryNames = []
+        rowDomains = []
+        values = []
+        for domainId, domain in enumerate(domains):
+            domainNames.append(domain.name)
+            for library, metrics in zip(domain.libraries, Metrics.domainMetrics(domain)):
+                libraryNames.append(library.name)
+                rowDomains.append(domainId)
+                values.append(libraryValues(library, metrics))
+        return RankingIndex(domainNames, libraryNames, numpy.array(rowDomains, dtype=numpy.int64),
+                            numpy.array(values, dtype=numpy.float64).reshape(len(values), len(RANKING_METRICS)))
+
+    def weightVector(self, weights):
+        # weights maps metric names to how much they count, missing ones count 0
+        vector = numpy.zeros(len(RANKING_METRICS))
+        names = list(RANKING_METRICS)
+        for name, weight in weights.items():
+            if name not in RANKING_METRICS:
+                raise ValueError('no ranking metric called ' + name)
+            if weight < 0:
+                raise ValueError('the weight of ' + name + ' can not be negative')
+            vector[names.index(name)] = weight
+        if vector.sum() == 0:
+            raise ValueError('at least one weight has to be more than 0')
+        return vector / vector.sum()
+
+    def composite(self, weightVector, rows=slice(None)):
+        return self.scores[rows] @ weightVector
+
+    def topK(self, k=10, weights=None, domainName=None):
+        """The k best libraries as (domain name, library name, score) from the
+        best down, over every domain or just the named one. weights maps
+        metric names to how much they count, DEFAULT_WEIGHTS when None. The
+        score is the weighted mean of the library's normalized scores"""
+        if domainName is None:
+            (start, end) = (0, len(self))
+        elif domainName in self.domainRows:
+            (start, end) = self.domainRows[domainName]
+        else:
+            raise ValueError('no domain called ' + domainName)
+        k = max(0, min(k, end - start))
+
+        vector = self.weightVector(DEFAULT_WEIGHTS if weights is None else weights)
+        single = numpy.flatnonzero(vector)
+        if weights is None or len(single) == 1:
+            # already sorted, the best rows are the start of the order
+            key = None if weights is None else list(RANKING_METRICS)[single[0]]
+            (order, domainOrder) = self.orders[key]
+            rows = order[:k] if domainName is None else domainOrder[start:start + k]
+            scores = self.composite(vector, rows)
+        else:
+            scores = self.composite(vector, slice(start, end))
+            best = numpy.argpartition(-scores, k - 1)[:k] if 0 < k < len(scores) else numpy.arange(k)
+            best = best[numpy.lexsort((best, -scores[best]))]
+            rows = best + start
+            scores = scores[best]
+
+        return [(self.domainNames[self.rowDomains[row]], self.libraryNames[row], float(score))
+                for row, score in zip(rows, scores)]
+
+
+def rankingIndex(domains):
+    """The RankingIndex of every domain in the registry, loading any that
+    aren't yet. It's kept on the registry with the domains' versions and only
+    rebuilt once one of them changes"""
+    for domain in domains:
+        domains.ensureLoaded(domain)
+    versions = tuple((domain.name, domain.version) for domain in domains)
+    if domains.ranking is None or domains.ranking[0] != versions:
+        with Profiling.phase('rankingIndex'):
+            domains.ranking = (versions, RankingIndex.fromDomains(domains))
+    return domains.ranking[1]
+
+
+def weightOption(text):
+    # 'name=weight' on the command line
+    (name, separator, weight) = text.partition('=')
+    if name not in RANKING_METRICS or not separator:
+        raise argparse.ArgumentTypeError('expected METRIC=WEIGHT with METRIC one of ' + ', '.join(RANKING_METRICS) + ', not ' + text)
+    try:
+        return (name, float(weight))
+    except ValueError:
+        raise argparse.ArgumentTypeError('not a number: ' + weight)
+
+
+def main(arguments=None):
+    # only needed to load the domains, not to rank them
+    import SnapshotCache
+
+    parser = argparse.ArgumentParser(description='Rank the libraries of every domain on a weighted score')
+    parser.add_argument('--data', default=DataParser.TABLE_DATA_DIRECTORY, help='the TableData directory')
+    parser.add_argument('--domain', metavar='NAME', help='only rank the libraries of this domain')
+    parser.add_argument('--top', type=int, default=10, help='how many libraries to show')
+    parser.add_argument('--weight', nargs='+', type=weightOption, default=[], metavar='METRIC=WEIGHT',
+                        help='how much each of ' + ', '.join(RANKING_METRICS) + ' counts. Without any '
+                             + 'they all count 1, with some the ones left out count 0')
+    options = parser.parse_args(arguments)
+
+    domains = SnapshotCache.loadTables(keepIssues=False, dataDirectory=options.data)
+    weights = dict(options.weight) or None
+    try:
+        ranked = rankingIndex(domains).topK(options.top, weights, options.domain)
+    except ValueError as error:
+        parser.error(str(error))
+    for place, (domainName, libraryName, score) in enumerate(ranked, 1):
+        print(str(place) + '. ' + libraryName + ' (' + domainName + ') ' + format(score, '.3f'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+import numpy
+
+import DataStructures
+import IssueTable
+
+
+# the bucket sizes rollups are kept at, as numpy datetime64 units
+GRANULARITIES = (('day', 'D'), ('month', 'M'), ('year', 'Y'))
+UNITS = tuple(unit for (granularity, unit) in GRANULARITIES)
+
+# what every issue bucket adds up. The counts by type come from the flags,
+# see DomainRollups.issueStats
+ISSUE_SUMS = ('count', 'unanswered', 'responseCount', 'responseSeconds', 'open', 'closingCount', 'closingSeconds')
+
+# how many chunks a RollupBuilder holds before folding them together
+MERGE_EVERY = 16
+
+
+class Rollup():
+    """Sums over the rows that share a (bucket, library, flags), for one
+    bucket size. buckets holds each row's bucket start as int64 counts of the
+    unit since the epoch, sorted, and NOT_A_TIME for rows with no date, which
+    sort first. Only buckets that have something in them get a row, so a
+    rollup is never bigger than the rows it was made from"""
+
+    def __init__(self, unit, buckets, libraryIds, flags, sums):
+        self.unit = unit
+        self.buckets = buckets
+        self.libraryIds = libraryIds
+        self.flags = flags
+        self.sums = sums
+
+    def __len__(self):
+        return len(self.buckets)
+
+    @staticmethod
+    def aggregate(unit, buckets, libraryIds, flags, sums):
+        # adds up the rows with the same key, the keys come out sorted
+        if len(buckets) == 0:
+            return Rollup(unit, buckets.astype(numpy.int64), libraryIds.astype(numpy.int32),
+                          flags.astype(numpy.uint8), {name: values.astype(numpy.float64) for name, values in sums.items()})
+        order = numpy.lexsort((flags, libraryIds, buckets))
+        (buckets, libraryIds, flags) = (buckets[order], libraryIds[order], flags[order])
+        starts = numpy.flatnonzero(numpy.r_[True, (buckets[1:] != buckets[:-1]) | (libraryIds[1:] != libraryIds[:-1])
+                                            | (flags[1:] != flags[:-1])])
+        return Rollup(unit, buckets[starts], libraryIds[starts].astype(numpy.int32), flags[starts].astype(numpy.uint8),
+                      {name: numpy.add.reduceat(values[order].astype(numpy.float64), starts)
+                       for name, values in sums.items()})
+
+    @staticmethod
+    def fromIssues(table, unit):
+        """The issue rollup of an IssueTable, bucketed by creation date. A
+        duration goes in the bucket its issue was created in, the same way a
+        Query picks issues"""
+        created = table.creationDates
+        answered = ~numpy.isnat(table.firstCommentDates) & ~numpy.isnat(created)
+        closed = ~numpy.isnat(table.closingDates) & ~numpy.isnat(created)
+        flags = table.performance * DataStructures.PERFORMANCE + table.security * DataStructures.SECURITY
+        sums = {'count': numpy.ones(len(table)),
+                'unanswered': numpy.isnat(table.firstCommentDates),
+                'responseCount': answered,
+                'responseSeconds': numpy.where(answered, (table.firstCommentDates - created).astype(numpy.float64), 0),
+                'open': numpy.isnat(table.closingDates),
+                'closingCount': closed,
+                'closingSeconds': numpy.where(closed, (table.closingDates - created).astype(numpy.float64), 0)}
+        return Rollup.aggregate(unit, created.astype('datetime64[' + unit + ']').view(numpy.int64),
+                                table.libraryIds, flags, sums)
+
+    @staticmethod
+    def fromReleases(libraryDates, unit):
+        # libraryDates is (library id, datetime64[D] release dates) pairs
+        ids = [numpy.full(len(dates), libraryId, dtype=numpy.int32) for (libraryId, dates) in libraryDates]
+        days = [dates for (libraryId, dates) in libraryDates]
+        buckets = numpy.concatenate([numpy.empty(0, dtype='datetime64[D]')] + days)
+        libraryIds = numpy.concatenate([numpy.empty(0, dtype=numpy.int32)] + ids)
+        return Rollup.aggregate(unit, buckets.astype('datetime64[' + unit + ']').view(numpy.int64), libraryIds,
+                                numpy.zeros(len(libraryIds), dtype=numpy.uint8), {'releases': numpy.ones(len(libraryIds))})
+
+    @staticmethod
+    def concatenate(rollups, unit):
+        rollups = list(rollups)
+        if len(rollups) == 1:
+            return rollups[0]
+        names = rollups[0].sums if rollups else ISSUE_SUMS
+        return Rollup.aggregate(unit,
+                                numpy.concatenate([numpy.empty(0, dtype=numpy.int64)] + [r.buckets for r in rollups]),
+                                numpy.concatenate([numpy.empty(0, dtype=numpy.int32)] + [r.libraryIds for r in rollups]),
+                                numpy.concatenate([numpy.empty(0, dtype=numpy.uint8)] + [r.flags for r in rollups]),
+                                {name: numpy.concatenate([numpy.empty(0)] + [r.sums[name] for r in rollups])
+                                 for name in names})
+
+    def take(self, rows):
+        return Rollup(self.unit, self.buckets[rows], self.libraryIds[rows], self.flags[rows],
+                      {name: values[rows] for name, values in self.sums.items()})
+
+    def rowRange(self, low, high):
+        """The rows whose buckets are in [low, high), both datetime64 values
+        on this rollup's unit or None to leave that side open. Rows with no
+        date are only in the range when both sides are open"""
+        if low is None and high is None:
+            return slice(0, len(self.buckets))
+        first = numpy.searchsorted(self.buckets, numpy.iinfo(numpy.int64).min, 'right')
+        if low is not None:
+            first = numpy.searchsorted(self.buckets, low.astype(numpy.int64), 'left')
+        last = len(self.buckets)
+        if high is not None:
+            last = numpy.searchsorted(self.buckets, high.astype(numpy.int64), 'left')
+        return slice(first, max(first, last))
+
+
+class RollupBuilder():
+    """Collects the rollups of chunks of issues, folding them together every
+    so often so they never hold more than a few chunks' worth of rows"""
+
+    def __init__(self):
+        self.chunks = {unit: [] for unit in UNITS}
+
+    def addIssues(self, table):
+        for unit in UNITS:
+            chunks = self.chunks[unit]
+            chunks.append(Rollup.fromIssues(table, unit))
+            if len(chunks) >= MERGE_EVERY:
+                self.chunks[unit] = [Rollup.concatenate(chunks, unit)]
+
+    def build(self):
+        # a Rollup for every unit
+        return {unit: Rollup.concatenate(chunks, unit) if chunks else
+                Rollup.fromIssues(IssueTable.IssueTable.empty(), unit)
+                for unit, chunks in self.chunks.items()}
+
+
+def floorTo(day, unit):
+    return day.astype('datetime64[' + unit + ']').astype('datetime64[D]')
+
+
+def ceilTo(day, unit):
+    floor = day.astype('datetime64[' + unit + ']')
+    if floor.astype('datetime64[D]') == day:
+        return day
+    return (floor + 1).astype('datetime64[D]')
+
+
+def windowPieces(start, end):
+    """Splits the days [start, end) into the fewest whole days, months and
+    years: days up to the first month, months up to the first year, whole
+    years, then months and days again at the end. Each piece is (unit, low,
+    high) with low and high on that unit, None for an open side"""
+    if start is not None and end is not None and end <= start:
+        return []
+
+    startMonth = None if start is None else ceilTo(start, 'M')
+    startYear = None if start is None else ceilTo(start, 'Y')
+    endMonth = None if end is None else floorTo(end, 'M')
+    endYear = None if end is None else floorTo(end, 'Y')
+
+    pieces = []
+
+    def add(unit, low, high):
+        if low is None or high is None or low < high:
+            pieces.append((unit, None if low is None else low.astype('datetime64[' + unit + ']'),
+                           None if high is None else high.astype('datetime64[' + unit + ']')))
+
+    if startYear is None or endYear is None or startYear <= endYear:
+        if start is not None:
+            add('D', start, startMonth)
+            add('M', startMonth, startYear)
+        add('Y', startYear, endYear)
+        if end is not None:
+            add('M', endYear, endMonth)
+            add('D', endMonth, end)
+    elif startMonth <= endMonth:
+        add('D', start, startMonth)
+        add('M', startMonth, endMonth)
+        add('D', endMonth, end)
+    else:
+        add('D', start, end)
+    return pieces
+
+
+def dayWindow(query):
+    """The query's time window as datetime64[D] days, (None, None) for no
+    window, or None when it doesn't start and end at midnight, which only
+    the raw rows can answer"""
+    def day(moment):
+        if moment is None:
+            return None
+        if moment.hour or moment.minute or moment.second or moment.microsecond:
+            raise ValueError
+        return numpy.datetime64(moment.date(), 'D')
+
+    if query is None:
+        return (None, None)
+    try:
+        return (day(query.start), day(query.end))
+    except ValueError:
+        return None
+
+
+def splitByDomain(rollups, domains):
+    """Splits {unit: Rollup} whose libraryIds count through every library of
+    every domain into one {unit: Rollup} per domain name, renumbering the ids
+    to match each domain.libraries"""
+    split = {domain.name: {} for domain in domains}
+    for unit, rollup in rollups.items():
+        first = 0
+        for domain in domains:
+            last = first + len(domain.libraries)
+            part = rollup.take((rollup.libraryIds >= first) & (rollup.libraryIds < last))
+            part.libraryIds = part.libraryIds - first
+            split[domain.name][unit] = part
+            first = last
+    return split
+
+
+class DomainRollups():
+    """A domain's issues and releases summed into day, month and year
+    buckets, worked out once at ingest. Any day aligned time window is
+    answered from a handful of buckets at the coarsest sizes that fit it
+    (see windowPieces) instead of from the raw rows"""
+
+    def __init__(self, numberOfLibraries, issues, releases):
+        self.numberOfLibraries = numberOfLibraries
+        # {unit: Rollup}
+        self.issues = issues
+        self.releases = releases
+
+    @staticmethod
+    def fromDomain(domain, issues):
+        # issues is a RollupBuilder's build() for the domain's issues
+        libraryDates = [(libraryId, numpy.array(library.releaseDates, dtype='datetime64[D]'))
+                        for libraryId, library in enumerate(domain.libraries)]
+        releases = {unit: Rollup.fromReleases(libraryDates, unit) for unit in UNITS}
+        return DomainRollups(len(domain.libraries), issues, releases)
+
+    def addIssues(self, table):
+        # issues appended after the rollups were made
+        for unit in UNITS:
+            self.issues[unit] = Rollup.concatenate([self.issues[unit], Rollup.fromIssues(table, unit)], unit)
+
+    def answers(self, query):
+        return dayWindow(query) is not None
+
+    def selectRows(self, rollups, query):
+        """The rows of rollups, a {unit: Rollup}, in the query's time window,
+        put together into one Rollup whose buckets are all in days"""
+        window = dayWindow(query)
+        if window is None:
+            raise ValueError('the rollups can only answer a window that starts and ends at midnight')
+        (start, end) = window
+        if start is None and end is None:
+            # every row, the ones with no date too
+            pieces = [('Y', None, None)]
+        else:
+            pieces = windowPieces(start, end)
+
+        parts = []
+        for (unit, low, high) in pieces:
+            part = rollups[unit].take(rollups[unit].rowRange(low, high))
+            part.buckets = part.buckets.view('datetime64[' + unit + ']').astype('datetime64[D]').view(numpy.int64)
+            parts.append(part)
+        # the pieces don't overlap, so their rows are simply put together
+        return Rollup('D', numpy.concatenate([numpy.empty(0, dtype=numpy.int64)] + [part.buckets for part in parts]),
+                      numpy.concatenate([numpy.empty(0, dtype=numpy.int32)] + [part.libraryIds for part in parts]),
+                      numpy.concatenate([numpy.empty(0, dtype=numpy.uint8)] + [part.flags for part in parts]),
+                      {name: numpy.concatenate([numpy.empty(0)] + [part.sums[name] for part in parts])
+                       for name in rollups['Y'].sums})
+
+    def issueStats(self, query=None):
+        """The same arrays as IssueTable.libraryStats, over the issues the
+        query's time window and issue types cover"""
+        rows = self.selectRows(self.issues, query)
+        performance = (rows.flags & DataStructures.PERFORMANCE) != 0
+        security = (rows.flags & DataStructures.SECURITY) != 0
+        generic = ~performance & ~security
+        if query is not None and query.issueTypes is not None:
+            keep = numpy.zeros(len(rows), dtype=bool)
+            if 'performance' in query.issueTypes:
+                keep |= performance
+            if 'security' in query.issueTypes:
+                keep |= security
+            if 'generic' in query.issueTypes:
+                keep |= generic
+            rows = rows.take(keep)
+            (performance, security, generic) = (performance[keep], security[keep], generic[keep])
+
+        def total(name, mask=None):
+            ids = rows.libraryIds if mask is None else rows.libraryIds[mask]
+            values = rows.sums[name] if mask is None else rows.sums[name][mask]
+            return numpy.bincount(ids, weights=values, minlength=self.numberOfLibraries)
+
+        def count(name, mask=None):
+            return total(name, mask).astype(numpy.int64)
+
+        return {'count': count('count'),
+                'performance': count('count', performance),
+                'security': count('count', security),
+                'generic': count('count', generic),
+                'unanswered': count('unanswered'),
+                'responseCount': count('responseCount'),
+                'responseSeconds': total('responseSeconds'),
+                'open': count('open'),
+                'closingCount': count('closingCount'),
+                'closingSeconds': total('closingSeconds')}
+
+    def releasesPerYear(self, query=None):
+        """(year, number of releases) in year order for every library, over
+        the releases in the query's time window"""
+        rows = self.selectRows(self.releases, query)
+        years = rows.buckets.view('datetime64[D]').astype('datetime64[Y]').astype(numpy.int64) + 1970
+        perLibrary = [{} for libraryId in range(self.numberOfLibraries)]
+        for libraryId, year, releases in zip(rows.libraryIds.tolist(), years.tolist(), rows.sums['releases'].tolist()):
+            perLibrary[libraryId][year] = perLibrary[libraryId].get(year, 0) + int(releases)
+        return [sorted(counts.items()) for counts in perLibrary]
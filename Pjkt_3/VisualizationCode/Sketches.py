@@ -0,0 +1,91 @@
+import math
+
+import numpy
+
+
+# Durations are counted in logarithmic bins, HDR histogram style: each bin is
+# GAMMA times as wide as the one before it, so any percentile read off the
+# bins is within RELATIVE_ERROR of the real one.
+# Every sketch uses the same bins, which is what lets two sketches merge by
+# adding their counts, whatever issues they were filled from
+RELATIVE_ERROR = 0.01
+GAMMA = (1 + RELATIVE_ERROR) / (1 - RELATIVE_ERROR)
+
+# durations up to this long keep the relative error, longer ones all land
+# in the last bin
+MAX_SECONDS = 50 * 365 * 86400
+
+# bin 0 is everything under a second, negative durations included
+BINS = int(math.ceil(math.log(MAX_SECONDS) / math.log(GAMMA))) + 2
+
+
+def binsOf(seconds):
+    """The bin of each duration in an array of seconds"""
+    seconds = numpy.asarray(seconds, dtype=numpy.float64)
+    bins = numpy.zeros(len(seconds), dtype=numpy.int64)
+    positive = seconds >= 1
+    bins[positive] = numpy.minimum(numpy.ceil(numpy.log(seconds[positive]) / math.log(GAMMA)).astype(numpy.int64) + 1,
+                                   BINS - 1)
+    return bins
+
+
+def binValue(index):
+    # the duration a bin stands for, the point whose relative error to both
+    # of the bin's edges is the same
+    if index == 0:
+        return 0.0
+    return 2 * GAMMA ** (index - 1) / (GAMMA + 1)
+
+
+def groupedCounts(groupIds, seconds, numberOfGroups):
+    """A numberOfGroups x BINS array of counts, row g being the histogram of
+    the durations whose groupIds are g, in one bincount"""
+    keys = numpy.asarray(groupIds, dtype=numpy.int64) * BINS + binsOf(seconds)
+    return numpy.bincount(keys, minlength=numberOfGroups * BINS).reshape(numberOfGroups, BINS)
+
+
+class Sketch():
+    """A histogram of durations over the fixed bins above. It takes the same
+    memory however many durations go in, two sketches merge into the one
+    that all their durations would've made, and a percentile comes back within
+    RELATIVE_ERROR. The counts array is only made for the first duration, so
+    an empty sketch is next to free"""
+
+    __slots__ = ('counts',)
+
+    def __init__(self, counts=None):
+        self.counts = counts
+
+    def __len__(self):
+        return 0 if self.counts is None else int(self.counts.sum())
+
+    def __getstate__(self):
+        return self.counts
+
+    def __setstate__(self, counts):
+        self.counts = counts
+
+    def add(self, seconds):
+        self.addCounts(groupedCounts(numpy.zeros(1, dtype=numpy.int64), [seconds], 1)[0])
+
+    def addCounts(self, counts):
+        if self.counts is None:
+            self.counts = numpy.zeros(BINS, dtype=numpy.int64)
+        self.counts += counts
+
+    def merge(self, other):
+        if other.counts is not None:
+            self.addCounts(other.counts)
+
+    def percentile(self, percent):
+        """The duration in seconds that percent of the durations are at most,
+        None for an empty sketch"""
+        if self.counts is None:
+            return None
+        total = self.counts.sum()
+        if total == 0:
+            return None
+        # the same rank numpy.percentile's 'lower' method picks
+        rank = int(math.floor(percent / 100.0 * (total - 1)))
+        index = int(numpy.searchsorted(numpy.cumsum(self.counts), rank, 'right'))
+        return binValue(index)
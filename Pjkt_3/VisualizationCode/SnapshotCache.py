@@ -0,0 +1,200 @@
+import hashlib
+import os
+import pickle
+
+import ColumnarStore
+import DataParser
+import LazyLoading
+import ParallelParser
+import Profiling
+
+
+# bump this whenever the classes in DataStructures or IssueTable change shape,
+# so snapshots written by older code get rebuilt instead of unpickled
+SNAPSHOT_VERSION = 10
+
+SNAPSHOT_FILE = '.parsed.snapshot'
+
+
+def snapshotPath(dataDirectory=DataParser.TABLE_DATA_DIRECTORY):
+    return os.path.join(dataDirectory, SNAPSHOT_FILE)
+
+
+def hashFile(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as dataFile:
+        for block in iter(lambda: dataFile.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fileSignatures(dataDirectory, hashes=None):
+    """(size, mtime, sha1) for every TableData file. Hashes already known for a
+    file whose size and mtime haven't changed are reused instead of reading the
+    file again"""
+    signatures = {}
+    for tableFile in DataParser.TABLE_FILES:
+        path = DataParser.tablePath(tableFile, dataDirectory)
+        stat = os.stat(path)
+        known = (hashes or {}).get(tableFile)
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            signatures[tableFile] = known
+        else:
+            signatures[tableFile] = (stat.st_size, stat.st_mtime_ns, hashFile(path))
+    return signatures
+
+
+def datasetVersion(signatures):
+    # one hash standing for the contents of the whole dataset
+    digest = hashlib.sha1()
+    for tableFile in sorted(signatures):
+        digest.update(tableFile.encode())
+        digest.update(signatures[tableFile][2].encode())
+    return digest.hexdigest()
+
+
+def writeSnapshot(path, header, domains):
+    temporaryPath = path + '.tmp'
+    with open(temporaryPath, 'wb') as snapshotFile:
+        pickle.dump(header, snapshotFile, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(domains, snapshotFile, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporaryPath, path)
+
+
+def isCurrent(header, options, dataDirectory):
+    """Checks a snapshot header against the TableData files. Files whose size
+    and mtime match are trusted as is, anything else is hashed, so touching a
+    file doesn't force a rebuild but editing it does"""
+    if header.get('version') != SNAPSHOT_VERSION or header.get('options') != options:
+        return (False, None)
+    try:
+        signatures = fileSignatures(dataDirectory, header.get('files'))
+    except OSError:
+        return (False, None)
+    stored = header.get('files', {})
+    current = all(tableFile in stored and stored[tableFile][2] == signature[2]
+                  for tableFile, signature in signatures.items())
+    return (current, signatures)
+
+
+def readSnapshot(keepIssues=True, keepIssueTable=True, dataDirectory=DataParser.TABLE_DATA_DIRECTORY):
+    """The domains in the data directory's snapshot when none of the csvs have
+    changed since it was written, otherwise None"""
+    options = (keepIssues, keepIssueTable)
+    path = snapshotPath(dataDirectory)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        # a snapshot is two pickles back to back, the small header first so
+        # it can be checked without unpickling the domains
+        with Profiling.phase('readSnapshot'), open(path, 'rb') as snapshotFile:
+            header = pickle.load(snapshotFile)
+            (current, signatures) = isCurrent(header, options, dataDirectory)
+            domains = pickle.load(snapshotFile) if current else None
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        # an unreadable snapshot is just rebuilt
+        return None
+
+    if domains is not None:
+        if signatures != header['files']:
+            # only mtimes moved, remember them so the files aren't hashed again
+            header['files'] = signatures
+            try:
+                writeSnapshot(path, header, domains)
+            except OSError:
+                pass
+        domains.datasetVersion = datasetVersion(signatures)
+    return domains
+
+
+def saveSnapshot(domains, keepIssues=True, keepIssueTable=True, dataDirectory=DataParser.TABLE_DATA_DIRECTORY,
+                 signatures=None):
+    """Writes the domains to the data directory's snapshot. signatures should
+    be taken before the csvs were read, so a file changed while they were
+    being parsed makes the snapshot stale instead of wrong"""
+    if signatures is None:
+        signatures = fileSignatures(dataDirectory)
+    domains.datasetVersion = datasetVersion(signatures)
+
+    path = snapshotPath(dataDirectory)
+    header = {'version': SNAPSHOT_VERSION, 'options': (keepIssues, keepIssueTable), 'files': signatures}
+    try:
+        with Profiling.phase('saveSnapshot'):
+            writeSnapshot(path, header, domains)
+    except OSError:
+        print('could not write the snapshot to ' + path)
+
+
+def readStore(keepIssues=True, keepIssueTable=True, dataDirectory=DataParser.TABLE_DATA_DIRECTORY):
+    """The domains in the data directory's ColumnarStore when none of the csvs
+    have changed since it was made, otherwise None. With no csvs at all the
+    store is used as is, so a copy of just the store is enough to run on"""
+    directory = ColumnarStore.storePath(dataDirectory)
+    with Profiling.phase('readStore'):
+        manifest = ColumnarStore.readManifest(directory)
+        if manifest is None:
+            return None
+
+        stored = {tableFile: tuple(signature) for tableFile, signature in (manifest['sources'] or {}).items()}
+        try:
+            signatures = fileSignatures(dataDirectory, stored)
+        except OSError:
+            signatures = None
+        if signatures is not None and any(tableFile not in stored or stored[tableFile][2] != signature[2]
+                                          for tableFile, signature in signatures.items()):
+            return None
+
+        domains = ColumnarStore.openStore(directory, keepIssues, keepIssueTable, manifest)
+    domains.datasetVersion = datasetVersion(signatures or stored)
+    return domains
+
+
+def saveStore(directory=None, dataDirectory=DataParser.TABLE_DATA_DIRECTORY):
+    """Parses the csvs and writes them out as a ColumnarStore, in the data
+    directory unless given another directory"""
+    signatures = fileSignatures(dataDirectory)
+    domains = DataParser.parseTables(keepIssues=True, keepIssueTable=False, dataDirectory=dataDirectory)
+    with Profiling.phase('saveStore'):
+        ColumnarStore.writeStore(domains, directory or ColumnarStore.storePath(dataDirectory), signatures)
+
+
+def loadTables(keepIssues=True, keepIssueTable=True, dataDirectory=DataParser.TABLE_DATA_DIRECTORY,
+               useCache=True, workers=None, lazy=False):
+    """Same as DataParser.parseTables, but loads the domains from the snapshot
+    in the data directory when none of the csvs have changed since it was
+    written, and writes a new one when they have. Given a number of workers
+    the csvs are parsed with ParallelParser. With lazy set and no usable
+    snapshot, only Library Info is read and each domain loads when it's first
+    opened (see LazyLoading). A current ColumnarStore is read before
+    anything else, lazily as well when lazy is set"""
+    if useCache:
+        domains = readStore(keepIssues, keepIssueTable, dataDirectory)
+        if domains is not None:
+            if not lazy:
+                for domain in domains:
+                    domains.ensureLoaded(domain)
+            return domains
+
+        domains = readSnapshot(keepIssues, keepIssueTable, dataDirectory)
+        if domains is not None:
+            return domains
+
+    if lazy:
+        return LazyLoading.loadLibraryInfo(keepIssues=keepIssues, keepIssueTable=keepIssueTable,
+                                           dataDirectory=dataDirectory)
+
+    signatures = fileSignatures(dataDirectory)
+    if workers is not None:
+        domains = ParallelParser.parseTablesInParallel(keepIssues=keepIssues, keepIssueTable=keepIssueTable,
+                                                       dataDirectory=dataDirectory, workers=workers)
+    else:
+        domains = DataParser.parseTables(keepIssues=keepIssues, keepIssueTable=keepIssueTable,
+                                         dataDirectory=dataDirectory)
+
+    if useCache:
+        saveSnapshot(domains, keepIssues, keepIssueTable, dataDirectory, signatures)
+    else:
+        domains.datasetVersion = datasetVersion(signatures)
+
+    return domains
@@ -0,0 +1,131 @@
+# Writes made up TableData in the same seven csv formats as the real one, at
+# whatever size is asked for, for Benchmark to run against:
+#
+#   python SyntheticData.py SyntheticData --libraries 300 --domains 30 --issues 2000000
+
+import argparse
+import csv
+import datetime
+import os
+import random
+
+import DataParser
+
+
+FIRST_DAY = datetime.date(2004, 1, 1)
+LAST_DAY = datetime.date(2018, 2, 28)
+
+
+def libraryName(number):
+    return 'library' + str(number).zfill(5)
+
+
+def domainName(number):
+    return 'domain' + str(number).zfill(3)
+
+
+def randomDay(rand, start=FIRST_DAY, end=LAST_DAY):
+    return start + datetime.timedelta(days=rand.randint(0, (end - start).days))
+
+
+def dateTimeText(rand, day, seconds):
+    # the Issue Data csv doesn't pad the hour, and some rows carry an offset
+    moment = datetime.datetime(day.year, day.month, day.day) + datetime.timedelta(seconds=seconds)
+    text = moment.strftime('%Y-%m-%d ') + str(moment.hour) + moment.strftime(':%M:%S')
+    if rand.random() < 0.05:
+        text += '-07:00'
+    return text
+
+
+def writeRows(path, header, rows):
+    with open(path, 'w', newline='') as csvfile:
+        writer = csv.writer(csvfile, lineterminator='\n')
+        writer.writerow(header)
+        writer.writerows(rows)
+
+
+def wideRows(columns):
+    # one column per library, shorter columns padded out with blanks
+    longest = max((len(column) for column in columns), default=0)
+    for i in range(longest):
+        yield [column[i] if i < len(column) else '' for column in columns]
+
+
+def issueRows(rand, libraries, issues):
+    for issueId in range(issues):
+        day = randomDay(rand)
+        created = rand.randint(0, 86399)
+        closing = 'None'
+        firstComment = 'None'
+        if rand.random() < 0.8:
+            firstComment = dateTimeText(rand, day, created + int(rand.expovariate(1 / 200000.0)))
+        if rand.random() < 0.7:
+            closing = dateTimeText(rand, day, created + int(rand.expovariate(1 / 2000000.0)))
+        yield [issueId, rand.choice(libraries), dateTimeText(rand, day, created), closing, firstComment,
+               'Yes' if rand.random() < 0.05 else 'No', 'Yes' if rand.random() < 0.05 else 'No']
+
+
+def generateTables(dataDirectory, libraries=33, domains=10, releases=300, issues=20000, seed=0):
+    """Writes the seven TableData csvs into dataDirectory. libraries are spread
+    evenly over the domains, each library gets up to releases release dates
+    and breaking change counts, and the issues go to random libraries"""
+    rand = random.Random(seed)
+    os.makedirs(dataDirectory, exist_ok=True)
+
+    def path(tableFile):
+        return DataParser.tablePath(tableFile, dataDirectory)
+
+    names = [libraryName(number) for number in range(libraries)]
+
+    writeRows(path(DataParser.LIBRARY_INFO), ['Library Name', 'Github Repository', 'Domain'],
+              ([name, 'synthetic/' + name, domainName(number % domains)] for number, name in enumerate(names)))
+
+    writeRows(path(DataParser.POPULARITY), ['Library', 'Popularity Count'],
+              ([name, rand.randint(0, 60000)] for name in names))
+
+    writeRows(path(DataParser.LAST_MODIFICATION_DATE), ['Library', 'Last Modification Date (YYYY-MM-DD)'],
+              ([name, randomDay(rand).isoformat()] for name in names))
+
+    stackOverflow = []
+    for name in names:
+        if rand.random() < 0.15:
+            stackOverflow.append([name, 'Never', 0])
+        else:
+            stackOverflow.append([name, randomDay(rand).isoformat(), rand.randint(1, 20000)])
+    writeRows(path(DataParser.STACK_OVERFLOW), ['Library', 'Last Discussed on Stack Overflow (YYYY-MM-DD)',
+                                                'Number of Questions Asked in Stack Overflow'], stackOverflow)
+
+    releaseCounts = [rand.randint(1, max(releases, 1)) for name in names]
+    releaseColumns = [sorted(randomDay(rand).isoformat() for i in range(count)) for count in releaseCounts]
+    writeRows(path(DataParser.RELEASE_FREQUENCY), ['Release Dates (YYYY-MM-DD) for ' + name for name in names],
+              wideRows(releaseColumns))
+
+    changeColumns = [[rand.choice((0, 0, 0, 1, 2, rand.randint(0, 500))) for i in range(count)]
+                     for count in releaseCounts]
+    writeRows(path(DataParser.BACKWARDS_COMPATIBILITY),
+              ['Release Number'] + ['# of Breaking Changes for ' + name for name in names],
+              ([number] + row for number, row in enumerate(wideRows(changeColumns), 1)))
+
+    writeRows(path(DataParser.ISSUE_DATA),
+              ['Issue ID', 'Library', 'Issue Creation Date (YYYY-MM-DD 24-hr)',
+               'Issue Closing Date (YYYY-MM-DD 24-hr)', 'Date of First Comment (YYYY-MM-DD 24-hr)',
+               'Performance Issue', 'Security Issue'],
+              issueRows(rand, names, issues))
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description='Write made up TableData csvs')
+    parser.add_argument('directory')
+    parser.add_argument('--libraries', type=int, default=33)
+    parser.add_argument('--domains', type=int, default=10)
+    parser.add_argument('--releases', type=int, default=300, help='most releases per library')
+    parser.add_argument('--issues', type=int, default=20000)
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args(arguments)
+
+    generateTables(options.directory, options.libraries, options.domains, options.releases, options.issues,
+                   options.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,29 +8,59 @@
 
 
 
+import collections
 import tkinter as tk
 from tkinter import ttk
 
-import DataStructures
-import DataParser
+import PlotCache
+import Profiling
+import Query
+import Ranking
+import BackgroundLoading
+import Graphs
 
-import datetime
-
-import matplotlib
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from matplotlib.figure import Figure
 
 
+# how often the app checks on the BackgroundLoader
+POLL_MILLISECONDS = 50
+
+# the choices above the graph tabs, and the Query each one stands for
+PERIODS = collections.OrderedDict([('All time', None),
+                                   ('Last 12 months', 12),
+                                   ('Last 5 years', 60)])
+ISSUE_TYPE_CHOICES = collections.OrderedDict([('All issues', None),
+                                              ('Performance', ('performance',)),
+                                              ('Security', ('security',)),
+                                              ('Generic', ('generic',))])
+
+# the names RankingPage shows for Ranking.RANKING_METRICS
+RANKING_LABELS = collections.OrderedDict([('popularity', 'Popularity'),
+                                          ('releaseFrequency', 'Releases a year'),
+                                          ('lastModified', 'Last modified'),
+                                          ('breakingChanges', 'Few breaking changes'),
+                                          ('responseTime', 'Quick responses'),
+                                          ('stackOverflow', 'Stack Overflow questions')])
+ALL_DOMAINS = 'All domains'
+# how many libraries RankingPage lists
+RANKING_TOP = 10
+
 
 class App(tk.Tk):
 
-    def __init__(self, domains):
+    def __init__(self, loader):
 
         tk.Tk.__init__(self)
 
         # tk.Tk.iconbitmap(self, default="clienticon.ico")
         tk.Tk.wm_title(self, "Visualizations")
 
+        # filled in by the loader, see poll_loader
+        self.domains = None
+        self.loader = loader
+        # the graph data for the domains looked at most recently
+        self.plotCache = PlotCache.PlotCache()
+
 
         container = tk.Frame(self)
         container.pack(side="top", fill="both", expand=True)
@@ -39,7 +69,7 @@ class App(tk.Tk):
 
         self.frames = {}
 
-        startPage = StartPage(container, self, domains)
+        startPage = StartPage(container, self)
         startPage.grid(row=0, column=0,sticky="nsew")
         self.frames[StartPage] = startPage
 
@@ -47,9 +77,37 @@ class App(tk.Tk):
         domianTabPage.grid(row=0, column=0,sticky="nsew")
         self.frames[DomainTabPage] = domianTabPage
 
+        rankingPage = RankingPage(container, self)
+        rankingPage.grid(row=0, column=0, sticky="nsew")
+        self.frames[RankingPage] = rankingPage
+
 
         self.show_frame(StartPage)
 
+        self.loader.start()
+        self.poll_loader()
+
+    def poll_loader(self):
+        # the loader's thread can't touch Tk, so its messages are picked up here
+        startPage = self.frames[StartPage]
+        for message in self.loader.poll():
+            kind = message[0]
+            if kind == BackgroundLoading.DOMAINS:
+                self.domains = message[1]
+                startPage.set_progress(0, len(self.domains))
+            elif kind == BackgroundLoading.DOMAIN:
+                (kind, domain, loaded, total) = message
+                startPage.add_domain(domain)
+                startPage.set_progress(loaded, total)
+            elif kind == BackgroundLoading.DONE:
+                startPage.loading_done()
+                return
+            elif kind == BackgroundLoading.ERROR:
+                print('could not load the table data: ' + str(message[1]))
+                startPage.loading_failed(message[1])
+                return
+
+        self.after(POLL_MILLISECONDS, self.poll_loader)
 
     def show_frame(self, cont):
         frame = self.frames[cont]
@@ -57,24 +115,56 @@ class App(tk.Tk):
 
     def show_domain(self, domain):
         frame = self.frames[DomainTabPage]
+        # reads the domain's tables now if they weren't loaded up front
+        self.domains.ensureLoaded(domain)
         frame.set_Domain(domain)
         frame.tkraise()
 
+    def show_ranking(self):
+        frame = self.frames[RankingPage]
+        frame.set_Domains(self.domains)
+        frame.tkraise()
+
 
 
 
 class StartPage(tk.Frame):
 
-    def __init__(self, parent, controller, domains):
+    def __init__(self, parent, controller):
         tk.Frame.__init__(self, parent)
+        self.controller = controller
+
         label = tk.Label(self, text="Pick a domain to compare libraries")
         label.pack(pady=10, padx=10)
 
+        # shows how many domains have been loaded, and goes away once they all are
+        self.progress = ttk.Progressbar(self, mode='determinate', length=200)
+        self.progress.pack(side=tk.TOP)
+        self.status = tk.Label(self, text="Loading the table data...")
+        self.status.pack(side=tk.TOP)
+
         self.buttons = []
-        for domain in domains:
-            button = tk.Button(self, text=domain.name, command=lambda domain=domain: controller.show_domain(domain))
-            button.pack(side=tk.TOP)
-            self.buttons.append(button)
+        # ranks the libraries of every domain, so it's only shown once they're all in
+        self.rankingButton = tk.Button(self, text='Best libraries overall', command=controller.show_ranking)
+
+    def add_domain(self, domain):
+        # a button for each domain once its data is in
+        button = tk.Button(self, text=domain.name, command=lambda domain=domain: self.controller.show_domain(domain))
+        button.pack(side=tk.TOP)
+        self.buttons.append(button)
+
+    def set_progress(self, loaded, total):
+        self.progress.configure(maximum=max(total, 1), value=loaded)
+        self.status.configure(text='Loaded ' + str(loaded) + ' of ' + str(total) + ' domains')
+
+    def loading_done(self):
+        self.progress.pack_forget()
+        self.status.pack_forget()
+        self.rankingButton.pack(side=tk.TOP, pady=10)
+
+    def loading_failed(self, error):
+        self.progress.pack_forget()
+        self.status.configure(text='Could not load the table data: ' + str(error))
 
 
 class DomainTabPage(tk.Frame):
@@ -89,374 +179,179 @@ class DomainTabPage(tk.Frame):
         backButton = ttk.Button(self, text="Go Home", command = lambda : controller.show_frame(StartPage))
         backButton.pack()
 
+        # what part of the domain's data the graphs cover
+        self.query = None
+        filterFrame = tk.Frame(self)
+        filterFrame.pack()
+        tk.Label(filterFrame, text='Period:').pack(side=tk.LEFT)
+        self.periodBox = ttk.Combobox(filterFrame, values=list(PERIODS), state='readonly', width=16)
+        self.periodBox.current(0)
+        self.periodBox.pack(side=tk.LEFT)
+        tk.Label(filterFrame, text='Issues:').pack(side=tk.LEFT)
+        self.issueTypeBox = ttk.Combobox(filterFrame, values=list(ISSUE_TYPE_CHOICES), state='readonly', width=12)
+        self.issueTypeBox.current(0)
+        self.issueTypeBox.pack(side=tk.LEFT)
+        self.periodBox.bind('<<ComboboxSelected>>', self.on_filter_changed)
+        self.issueTypeBox.bind('<<ComboboxSelected>>', self.on_filter_changed)
+        # which statistic of the issue durations the time graphs show
+        tk.Label(filterFrame, text='Times:').pack(side=tk.LEFT)
+        self.statisticBox = ttk.Combobox(filterFrame, values=list(Graphs.STATISTICS.values()), state='readonly',
+                                         width=16)
+        self.statisticBox.current(0)
+        self.statisticBox.pack(side=tk.LEFT)
+        self.statisticBox.bind('<<ComboboxSelected>>', self.on_statistic_changed)
+
         self.tabFrame = ttk.Notebook(self)
         self.tabFrame.pack()
 
         self.visualFrames = []
 
-        popularityFrame = PopularityGraph(self.tabFrame)
-        self.visualFrames.append(popularityFrame)
-        self.tabFrame.add(popularityFrame, text='Compare Popularity')
-
-        releaseFrame = ReleaseFrequencyGraph(self.tabFrame)
-        self.visualFrames.append(releaseFrame)
-        self.tabFrame.add(releaseFrame, text='Release Frequency')
-
-        lastModifiedFrame = LastModifiedGraph(self.tabFrame)
-        self.visualFrames.append(lastModifiedFrame)
-        self.tabFrame.add(lastModifiedFrame, text='Last Modified')
-
-        issuesFrame = IssueTypeGraph(self.tabFrame)
-        self.visualFrames.append(issuesFrame)
-        self.tabFrame.add(issuesFrame, text='Issues Types')
+        for graphClass in Graphs.GRAPHS:
+            visualFrame = VisualizationFrame(self.tabFrame, graphClass(controller.plotCache))
+            self.visualFrames.append(visualFrame)
+            self.tabFrame.add(visualFrame, text=graphClass.tabText)
 
-        issuesResponseTime = IssueResponseTimeGraph(self.tabFrame)
-        self.visualFrames.append(issuesResponseTime)
-        self.tabFrame.add(issuesResponseTime, text='Issue Response time')
 
-        issuesClossingTime = IssueClosingTimeGraph(self.tabFrame)
-        self.visualFrames.append(issuesClossingTime)
-        self.tabFrame.add(issuesClossingTime, text='Issue Closing time')
-
-        breakingChangesFrame = BackwardsCompatibilityGraph(self.tabFrame)
-        self.visualFrames.append(breakingChangesFrame)
-        self.tabFrame.add(breakingChangesFrame, text='Backwards Compatibility')
-
-        stackOverflowFrame = StackOverflowGraph(self.tabFrame)
-        self.visualFrames.append(stackOverflowFrame)
-        self.tabFrame.add(stackOverflowFrame, text='Stack Overflow')
+        # graphs are only drawn once their tab is shown, and then only once
+        # per domain
+        self.domain = None
+        self.drawnFrames = set()
+        self.tabFrame.bind('<<NotebookTabChanged>>', self.on_tab_changed)
 
 
     def set_Domain(self, domain):
+        if domain is not self.domain:
+            self.drawnFrames = set()
         self.domain = domain
         self.label.config(text='Comparing libraries for: ' + self.domain.name)
+        self.draw_current_tab()
+
+    def on_filter_changed(self, event):
+        months = PERIODS[self.periodBox.get()]
+        issueTypes = ISSUE_TYPE_CHOICES[self.issueTypeBox.get()]
+        if months is None and issueTypes is None:
+            self.query = None
+        elif months is None:
+            self.query = Query.Query(issueTypes=issueTypes)
+        else:
+            self.query = Query.Query.lastMonths(months, issueTypes=issueTypes)
+        self.drawnFrames = set()
+        if self.domain is not None:
+            self.draw_current_tab()
+
+    def on_statistic_changed(self, event):
+        statistic = list(Graphs.STATISTICS)[self.statisticBox.current()]
         for visual in self.visualFrames:
-            visual.drawGraph(domain)
-
-
-
-
-
-
-
-class VisualizationFrame(tk.Frame):
-
-    def __init__(self, parent):
-        tk.Frame.__init__(self, parent)
-
-        self.figure = Figure(figsize=(5, 5), dpi=100)
-        self.axis = self.figure.add_subplot(111)
-        self.figure.subplots_adjust(bottom=0.5)
-
-        self.canvas = FigureCanvasTkAgg(self.figure, self)
-        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
-
-    def drawGraph(self, domain):
-        self.axis.clear()
-
-
-class PopularityGraph(VisualizationFrame):
-
-    def drawGraph(self, domain):
-        super().drawGraph(domain)
-        x = []
-        heights = []
-        names = []
-        for i in range(len(domain.libraries)):
-            x.append(i)
-            heights.append(int(domain.libraries[i].popularity))
-            names.append(domain.libraries[i].name)
-        # print(x)
-        # print(heights)
-        # print(names)
+            if isinstance(visual.graph, Graphs.DurationGraph):
+                visual.graph.statistic = statistic
+                self.drawnFrames.discard(visual)
+        if self.domain is not None:
+            self.draw_current_tab()
 
-        self.axis.bar(x, heights, tick_label=names)
-        self.axis.tick_params(axis='x', labelrotation=45)
+    def on_tab_changed(self, event):
+        if self.domain is not None:
+            self.draw_current_tab()
 
-        self.axis.set_title(label="The number of projects that use each library")
-        self.axis.set_ylabel('Number of projects')
-        self.axis.set_xlabel('Libraries')
+    def draw_current_tab(self):
+        # the tabs were added in the same order as visualFrames
+        visual = self.visualFrames[self.tabFrame.index('current')]
+        if visual not in self.drawnFrames:
+            visual.drawGraph(self.domain, self.query)
+            self.drawnFrames.add(visual)
 
-        self.canvas.draw()
 
 
-class ReleaseFrequencyGraph(VisualizationFrame):
 
-    def drawGraph(self, domain):
-        super().drawGraph(domain)
-
-        for library in domain.libraries:
-            years = []
-            counts = []
-            for date in library.releaseDates:
-                year = datetime.date(date.year, 1, 1)
-                if year in years:
-                    index = years.index(year)
-                    counts[index] += 1
-                else:
-                    years.append(year)
-                    counts.append(1)
-
-            self.axis.plot_date(matplotlib.dates.date2num(years), counts, ls='solid', label=library.name)
-
-        self.axis.tick_params(axis='x', labelrotation=45)
-
-        self.axis.set_title(label='The number of releases per year for each library')
-        self.axis.set_ylabel('Number of releases')
-        self.axis.set_xlabel('Time')
-        self.axis.legend()
-        self.canvas.draw()
-
-
-class LastModifiedGraph(VisualizationFrame):
-
-    def drawGraph(self, domain):
-        super().drawGraph(domain)
-
-        for library in domain.libraries:
-            matdate = matplotlib.dates.date2num(library.lastModificationDate)
-            self.axis.plot_date(matdate, [1], label=library.name)
-            # self.axis.annotate(xy=(matdate, 1), s=library.name)
-            # self.axis.axvline(matplotlib.dates.date2num(library.lastModificationDate))
-
-        date = matplotlib.dates.date2num(datetime.date.today())
-        self.axis.axvline(date,color='r')
-        self.axis.text(date,1,"Today", rotation=90)
-        # self.axis.legend(bbox_to_anchor=(0.7, -0.5))
-        self.axis.tick_params(axis='x', labelrotation=45)
-
-        self.axis.set_title('The last time each library was modified')
-        self.axis.set_xlabel("Time")
-        self.axis.legend()
-        self.axis.set_yticks([])
-        self.canvas.draw()
-
-
-class IssueTypeGraph(VisualizationFrame):
-
-    def drawGraph(self, domain):
-        super().drawGraph(domain)
-
-        x = []
-        genIssues = []
-        secIssues = []
-        perIssues = []
-        secPlusPerIssues = []
-        names = []
-        i = -1
-        for library in domain.libraries:
-            i += 1
-            x.append(i)
-            names.append(library.name)
-            genIssues.append(0)
-            secIssues.append(0)
-            perIssues.append(0)
-            secPlusPerIssues.append(0)
-
-            genCount = 0
-            secCount = 0
-            perCount = 0
-            for issue in library.issues:
-                if issue.security:
-                    secCount += 1
-                if issue.performance:
-                    perCount += 1
-                if not issue.security and not issue.performance:
-                    genCount += 1
-
-            total = genCount + secCount + perCount
-
-            if total == 0:
-                genIssues[i] = 0
-                secIssues[i] = 0
-                perIssues[i] = 0
-            else:
-                genIssues[i] = genCount / total * 100
-                secIssues[i] = secCount / total * 100
-                perIssues[i] = perCount / total * 100
-
-            secPlusPerIssues[i] = secIssues[i] + perIssues[i]
-
-        p1 = self.axis.bar(x, perIssues, tick_label=names)
-        p2 = self.axis.bar(x, secIssues, bottom=perIssues)
-        p3 = self.axis.bar(x, genIssues, bottom=secPlusPerIssues)
-        self.axis.legend((p1[0], p2[0], p3[0]), ('Performance', 'Security', 'Generic'))
-
-        self.axis.yaxis.set_major_formatter(matplotlib.ticker.PercentFormatter())
-        self.axis.tick_params(axis='x', labelrotation=45)
-
-        self.axis.set_title('Types of Issues per library')
-        self.axis.set_ylabel('Percent of the total issues')
-        self.axis.set_xlabel('Libraries')
-        self.canvas.draw()
-
-
-class IssueResponseTimeGraph(VisualizationFrame):
-    """Draws a side by side bar graph showing the average response time and
-    the number of unanswered issues per library"""
-
-    def __init__(self, parent):
-        VisualizationFrame.__init__(self, parent)
-
-        self.twinAxis = self.axis.twinx()
-
-    def drawGraph(self, domain):
-        super().drawGraph(domain)
-
-        xTicks = []
-        names = []
-        numberUnanswered = []
-        averageResponseTime = []
-
-        for libIndex in range(len(domain.libraries)):
-            xTicks.append(libIndex)
-            names.append(domain.libraries[libIndex].name)
-
-            numberUnanswered.append(0)
-            averageResponseTime.append(0)
-
-            responseTimes = []
-            for issue in domain.libraries[libIndex].issues:
-                if issue.firstCommentDate == None:
-                    numberUnanswered[libIndex] += 1
-                else:
-                    responseTimes.append(issue.firstCommentDate - issue.creationDate)
-
-            total = datetime.timedelta()
-            for time in responseTimes:
-                total += time
-
-            if len(responseTimes) != 0:
-                ave = total / len(responseTimes)
-                averageResponseTime[libIndex] = ave.seconds/86400
 
 
-        width = 0.4
-        self.axis.tick_params(axis='x', labelrotation=45)
-        self.twinAxis.clear()
 
-        p1 = self.axis.bar(xTicks, averageResponseTime, width=-width, align='edge', color='b', tick_label=names)
-        self.axis.set_ylabel("Response Time (Days)")
-        p2 = self.twinAxis.bar(xTicks, numberUnanswered, width=width, align='edge', color='r')
-        self.twinAxis.set_ylabel("Unanswered Issues")
-        self.twinAxis.legend((p1,p2), ('Average Reponse Time', 'Number of Unanswered issues'))
-        self.axis.set_title('Average time to respond to issues and the number of issues that have no response')
-        self.axis.set_xlabel('Libraries')
-
-        self.canvas.draw()
-
-
-class IssueClosingTimeGraph(VisualizationFrame):
+class RankingPage(tk.Frame):
+    """The best libraries of every domain, or of one, on a score whose
+    weights can be changed"""
 
+    def __init__(self, parent, controller):
+        tk.Frame.__init__(self, parent)
+        self.controller = controller
+        self.domains = None
 
-    def __init__(self, parent):
-        VisualizationFrame.__init__(self, parent)
+        backButton = ttk.Button(self, text="Go Home", command = lambda : controller.show_frame(StartPage))
+        backButton.pack()
 
-        self.twinAxis = self.axis.twinx()
+        self.domainBox = ttk.Combobox(self, values=[ALL_DOMAINS], state='readonly', width=30)
+        self.domainBox.current(0)
+        self.domainBox.pack()
+        self.domainBox.bind('<<ComboboxSelected>>', self.on_ranking_changed)
+
+        # how much each metric counts
+        weightFrame = tk.Frame(self)
+        weightFrame.pack()
+        self.weights = collections.OrderedDict()
+        for row, (name, label) in enumerate(RANKING_LABELS.items()):
+            tk.Label(weightFrame, text=label).grid(row=row, column=0, sticky='w')
+            weight = tk.Spinbox(weightFrame, from_=0, to=5, width=4, command=self.on_ranking_changed)
+            weight.delete(0, tk.END)
+            weight.insert(0, '1')
+            weight.grid(row=row, column=1)
+            self.weights[name] = weight
+
+        self.status = tk.Label(self)
+        self.status.pack()
+        self.rankingList = tk.Listbox(self, width=60, height=RANKING_TOP)
+        self.rankingList.pack()
+
+    def set_Domains(self, domains):
+        self.domains = domains
+        self.domainBox.configure(values=[ALL_DOMAINS] + [domain.name for domain in domains])
+        self.show_ranking()
+
+    def on_ranking_changed(self, event=None):
+        if self.domains is not None:
+            self.show_ranking()
+
+    def show_ranking(self):
+        domainName = self.domainBox.get()
+        if domainName == ALL_DOMAINS:
+            domainName = None
+        self.rankingList.delete(0, tk.END)
+        try:
+            weights = {name: float(weight.get()) for name, weight in self.weights.items()}
+            ranked = Ranking.rankingIndex(self.domains).topK(RANKING_TOP, weights, domainName)
+        except ValueError as error:
+            self.status.configure(text=str(error))
+            return
+        self.status.configure(text='')
+        for place, (domain, library, score) in enumerate(ranked, 1):
+            self.rankingList.insert(tk.END, str(place) + '. ' + library + ' (' + domain + ') ' + format(score, '.3f'))
 
-    def drawGraph(self, domain):
-        super().drawGraph(domain)
 
-        self.twinAxis.clear()
+class VisualizationFrame(tk.Frame):
+    """A tab showing one of the Graphs on a Tk canvas"""
 
-        xTicks = []
-        names = []
-        numberOpen = []
-        averageClosingTime = []
+    def __init__(self, parent, graph):
+        tk.Frame.__init__(self, parent)
 
-        for libIndex in range(len(domain.libraries)):
-            xTicks.append(libIndex)
-            names.append(domain.libraries[libIndex].name)
+        self.graph = graph
+        self.figure = graph.figure
 
-            numberOpen.append(0)
-            averageClosingTime.append(0)
+        self.canvas = FigureCanvasTkAgg(self.figure, self)
+        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
-            responseTimes = []
-            for issue in domain.libraries[libIndex].issues:
-                if issue.closingDate == None:
-                    numberOpen[libIndex] += 1
+    def drawGraph(self, domain, query=None):
+        with Profiling.phase('drawGraph'):
+            updated = self.graph.drawGraph(domain, query)
+            with Profiling.phase('canvas.draw'):
+                # updated artists only need the canvas redrawn once Tk is idle
+                if updated:
+                    self.canvas.draw_idle()
                 else:
-                    responseTimes.append(issue.closingDate - issue.creationDate)
-
-            total = datetime.timedelta()
-            for time in responseTimes:
-                total += time
-
-            if len(responseTimes) != 0:
-                ave = total / len(responseTimes)
-                averageClosingTime[libIndex] = ave.seconds / 86400
-
-        width = 0.4
-        self.axis.tick_params(axis='x', labelrotation=45)
-
-        p1 = self.axis.bar(xTicks, averageClosingTime, width=-width, align='edge', color='b', tick_label=names)
-        self.axis.set_ylabel("Closing Time (Days)")
-        p2 = self.twinAxis.bar(xTicks, numberOpen, width=width, align='edge', color='r')
-        self.twinAxis.set_ylabel("Open Issues")
-        self.twinAxis.legend((p1, p2), ('Average Closing Time', 'Number of Open issues'))
-        self.axis.set_title('Average time to close an issue and the number of open issues')
-        self.axis.set_xlabel('Libraries')
-
-        self.canvas.draw()
-
-
-class BackwardsCompatibilityGraph(VisualizationFrame):
-
-    def drawGraph(self, domain):
-        super().drawGraph(domain)
-
-        xTicks = []
-        breakingChanges = []
-        names = []
-
-        for idx, library in enumerate(domain.libraries):
-            xTicks.append(idx)
-            names.append(library.name)
-            breakingChanges.append(0)
-
-            for (release, changes) in library.breakingChangesPerRelease:
-                # print(library.name)
-                # print(str(release) + '|' + str(changes))
-                breakingChanges[idx] += changes
-
-            breakingChanges[idx] = breakingChanges[idx] / len(library.breakingChangesPerRelease)
-
-        self.axis.bar(xTicks, breakingChanges, tick_label=names)
-        self.axis.set_ylabel('Average Breaking changes')
-        self.axis.set_title('The average number of breaking changes per release')
-        self.axis.set_xlabel('Libraries')
-
-        self.canvas.draw()
-
-
-class StackOverflowGraph(VisualizationFrame):
-
-    def drawGraph(self, domain):
-        super().drawGraph(domain)
-
-        for library in domain.libraries:
-            if library.lastDiscussedOnStackOverflow != 'Never':
-
-                self.axis.plot_date(matplotlib.dates.date2num(library.lastDiscussedOnStackOverflow), [int(library.questionsAsked)] ,label= library.name)
-
-        today = matplotlib.dates.date2num(datetime.date.today())
-        self.axis.axvline(today, color='r')
-
-        (min, max) = self.axis.get_ylim()
-        mid = (max - min)/2  + min
-
-        self.axis.text(today, mid,  'Today', rotation= 90)
-        self.axis.tick_params(axis='x', labelrotation=45)
-        self.axis.set_title('The last time a library was disused on stack overflow and the number of questions asked about it')
-        self.axis.set_ylabel('The number of questions')
-        self.axis.set_xlabel('Time last discussed on stack overflow')
-        self.axis.legend()
-        self.canvas.draw()
-
+                    self.canvas.draw()
 
 
 
-domains = DataParser.parseTables()
 
-app = App(domains)
-app.mainloop()
\ No newline at end of file
+# the graphs only need the per library issue totals, so don't hold on to
+# every issue. The window opens straight away and the domains show up on the
+# start page as the loader gets through them
+if __name__ == '__main__':
+    app = App(BackgroundLoading.BackgroundLoader(keepIssues=False))
+    app.mainloop()